@@ -0,0 +1,288 @@
+"""
+This module provides a headless command line mode to look up the streaming offers of many
+titles, e.g. for catalog audits, without starting the Flet interface.
+
+Titles are read one per line from a file, or from the standard input, and looked up with
+`find_titles` and `find_offers` on a bounded pool of workers. The best match of each title
+is written, as soon as it is resolved, as a JSON line or as CSV rows. When the output is a
+file, it doubles as a checkpoint: running the same command again skips the titles already
+written, so an interrupted run resumes where it stopped. Titles that fail, or whose offers
+could only be retrieved for some countries, are reported on the standard error and looked
+up again on the next run.
+
+Usage:
+    python batch.py titles.txt --country US --language en --scope ALL --output offers.jsonl
+    cat titles.txt | python batch.py --format csv --output offers.csv
+
+Includes functions:
+  - read_titles(source: str):
+      Yields the titles to look up.
+  - completed_titles(path: str, output_format: str) -> set:
+      Returns the titles already written to an output file.
+  - lookup(title: str, country: str, language: str, countries: set) -> dict:
+      Looks up the best match of a title and its offers.
+  - run(args) -> int:
+      Looks up every title and writes the results.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from constants import BATCH_WORKERS, ORDERED_SERVICES
+from helpers import (
+    PartialOffers,
+    find_offers,
+    find_titles,
+    offers_as_dict,
+    resolve_countries,
+)
+
+CSV_FIELDS = [
+    "query",
+    "entry_id",
+    "title",
+    "release_year",
+    "country",
+    "service",
+    "price",
+    "url",
+]
+
+
+def read_titles(source: str):
+    """
+    This function yields the titles to look up, skipping blank lines.
+
+    Args:
+        source: Path of a file with one title per line, or "-" for the standard input.
+
+    Yields:
+        The titles, stripped of surrounding whitespace.
+    """
+    file = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        for line in file:
+            if line.strip():
+                yield line.strip()
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def completed_titles(path: str, output_format: str) -> set:
+    """
+    This function returns the titles already written to an output file by a previous run.
+    A last line left incomplete by an interruption is removed from the file. In CSV, the
+    rows of the last title are removed too, since an interruption may have left some of
+    them unwritten, so that it is looked up again.
+
+    Args:
+        path: Location of the output file.
+        output_format: Either "jsonl" or "csv".
+
+    Returns:
+        The normalized titles found in the file.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, "rb+") as file:
+        data = file.read()
+        if data and not data.endswith(b"\n"):
+            file.truncate(data.rfind(b"\n") + 1)
+    with open(path, encoding="utf-8", newline="") as file:
+        if output_format != "csv":
+            return {
+                _normalize(json.loads(line)["query"]) for line in file if line.strip()
+            }
+        rows = list(csv.DictReader(file))
+    kept = len(rows)
+    while kept and rows[kept - 1]["query"] == rows[-1]["query"]:
+        kept -= 1
+    with open(path, "rb+") as file:
+        data = file.read()
+        tail = _csv_rows(rows[kept:]).encode()
+        if tail and data.endswith(tail):
+            file.truncate(len(data) - len(tail))
+    return {_normalize(row["query"]) for row in rows[:kept]}
+
+
+def lookup(title: str, country: str, language: str, countries: set) -> dict:
+    """
+    This function looks up the best match of a title and its streaming offers.
+
+    Args:
+        title: The title to search for.
+        country: 2-letter ISO code of the country the title is searched in.
+        language: 2-letter code of the language of the results.
+        countries: 2-letter ISO codes of the countries to search offers in.
+
+    Returns:
+        A dictionary with the title searched ("query"), the identifier, title and release
+        year of the best match, and its offers as returned by `offers_as_dict`. The match
+        fields are None and the offers empty if nothing was found.
+
+    Raises:
+        RuntimeError: If the offers of some countries could not be retrieved.
+    """
+    record = {"query": title, "entry_id": None, "title": None, "release_year": None}
+    movies = find_titles(title, country, language)
+    if not movies:
+        return {**record, "offers": {}}
+    movie = movies[0]
+    offers = find_offers(movie.entry_id, countries)
+    if isinstance(offers, PartialOffers):
+        failed = ", ".join(sorted(offers.failed))
+        raise RuntimeError(f"offers could not be retrieved for {failed}")
+    record.update(
+        entry_id=movie.entry_id, title=movie.title, release_year=movie.release_year
+    )
+    return {**record, "offers": offers_as_dict(offers)}
+
+
+def run(args) -> int:
+    """
+    This function looks up every title and writes the results as they are resolved.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        int: The exit status, 1 if any title failed, 0 otherwise.
+    """
+    countries = resolve_countries(args.scope, args.country)
+    done = completed_titles(args.output, args.format) if args.output else set()
+    if args.output:
+        out = open(args.output, "a", encoding="utf-8", newline="")
+    else:
+        out = sys.stdout
+    write = _writer(out, args.format)
+    failures = 0
+    executor = ThreadPoolExecutor(args.workers, thread_name_prefix="batch")
+    pending = {}
+    try:
+        for title in read_titles(args.input):
+            key = _normalize(title)
+            if key in done:
+                continue
+            done.add(key)
+            future = executor.submit(
+                lookup, title, args.country, args.language, countries
+            )
+            pending[future] = title
+            if len(pending) >= args.workers * 2:
+                failures += _write_finished(pending, write, out)
+        while pending:
+            failures += _write_finished(pending, write, out)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failures else 0
+
+
+def _write_finished(pending: dict, write, out) -> int:
+    """
+    This function waits for at least one lookup to complete and writes the results of
+    those completed.
+
+    Args:
+        pending: Dictionary mapping the futures of the lookups in progress to their title.
+            Completed futures are removed from it.
+        write: Function writing a record, as returned by `_writer`.
+        out: The output file, flushed after writing.
+
+    Returns:
+        int: The number of lookups that failed.
+    """
+    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+    failures = 0
+    for future in finished:
+        title = pending.pop(future)
+        try:
+            write(future.result())
+        except Exception as e:
+            message = (str(e).splitlines() or [type(e).__name__])[0]
+            print(f"{title}: {message}", file=sys.stderr)
+            failures += 1
+    out.flush()
+    return failures
+
+
+def _writer(out, output_format: str):
+    """
+    This function returns a function writing a record to the output in the given format.
+    The CSV header is written if the output is empty.
+
+    Args:
+        out: The output file.
+        output_format: Either "jsonl" or "csv". CSV records are written as one row per
+            available offer, or a single row without country if there is none, all the
+            rows of a record being written at once.
+
+    Returns:
+        A function taking a record returned by `lookup`.
+    """
+    if output_format == "jsonl":
+        return lambda record: out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    if out is sys.stdout or out.tell() == 0:
+        csv.DictWriter(out, CSV_FIELDS).writeheader()
+
+    def write(record: dict):
+        fields = {key: record[key] for key in CSV_FIELDS[:4]}
+        rows = [
+            {**fields, "country": country, "service": service, **offer}
+            for country, services in sorted(record["offers"].items())
+            for service in ORDERED_SERVICES
+            if (offer := services[service]) is not None
+        ]
+        out.write(_csv_rows(rows or [fields]))
+
+    return write
+
+
+def _csv_rows(rows: list) -> str:
+    """
+    This function formats rows of the CSV output, without header.
+    """
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, CSV_FIELDS).writerows(rows)
+    return buffer.getvalue()
+
+
+def _normalize(title: str) -> str:
+    """
+    This function normalizes a title the same way the search cache does.
+    """
+    return " ".join(title.split()).casefold()
+
+
+def main():
+    """
+    Parses the command line arguments and runs the batch lookup.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "input", nargs="?", default="-", help="file with one title per line"
+    )
+    parser.add_argument("--country", default="US")
+    parser.add_argument("--language", default="en")
+    parser.add_argument(
+        "--scope", default="ALL", help='countries of the offers, e.g. "EU"'
+    )
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--output", help="file the results are appended to")
+    args = parser.parse_args()
+    try:
+        sys.exit(run(args))
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+This module provides the in-process caches used to avoid repeated JustWatch lookups.
+
+Includes classes:
+  - CountingCache: A bounded, thread-safe TTL cache with LRU eviction that keeps
+      track of its hits and misses.
+"""
+
+import threading
+from cachetools import TTLCache
+
+from instrumentation import count
+
+
+class CountingCache:
+    """
+    This class wraps a `cachetools.TTLCache` and counts cache hits and misses.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, name: str = "cache"):
+        """
+        Initializes an empty cache.
+
+        Args:
+            maxsize: Maximum number of entries kept before the least recently used
+                one is evicted.
+            ttl: Number of seconds after which an entry expires.
+            name: Name used for the instrumentation counters of the cache.
+        """
+        self.name = name
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns the value stored for the given key.
+
+        Args:
+            key: Hashable key of the entry.
+
+        Returns:
+            The cached value, or None if the key is missing or expired.
+        """
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        count(f"cache.{self.name}." + ("miss" if value is None else "hit"))
+        return value
+
+    def set(self, key, value):
+        """
+        Stores a value for the given key, evicting the least recently used entry if
+        the cache is full.
+
+        Args:
+            key: Hashable key of the entry.
+            value: Value to store. None values are not cached.
+        """
+        if value is None:
+            return
+        with self._lock:
+            self._cache[key] = value
+
+    def items(self) -> list:
+        """
+        Returns the entries currently stored, without affecting the counters.
+
+        Returns:
+            A list of `(key, value)` tuples.
+        """
+        with self._lock:
+            self._cache.expire()
+            return list(self._cache.items())
+
+    def pop(self, key):
+        """
+        Removes the entry stored for the given key, if any.
+
+        Args:
+            key: Hashable key of the entry.
+        """
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def clear(self):
+        """
+        Removes every entry from the cache and resets the counters.
+        """
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the current usage of the cache.
+
+        Returns:
+            A dictionary with the number of hits, misses and stored entries.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
@@ -3,20 +3,138 @@ This module provides constants used for movie information processing.
 
 Constants:
   - ALL_COUNTRIES (set of str): Contains the 2-letter ISO codes for all countries.
+  - REGIONS (dict of str: set of str): Maps region presets (like "EU") to their countries.
   - GENRE_MAPPING (dict of str: str): Maps short genre codes (like "act") to full genre 
     names (like "Action").
   - INCLUDED_SERVICES (set of str): Set of streaming service names to be included in processing.
   - ORDERED_SERVICES (list of str): Ordered list of streaming services for display purposes.
   - DUPLICATED_SERVICE (set of str): Set containing a service name that might appear as a duplicate.
+  - OFFERS_PAGE_SIZE (int): Number of countries displayed per page of the offers table.
+  - SEARCH_RESULTS (int): Maximum number of movies returned by a search.
+  - SEARCH_LOCALES (list of tuple), SEARCH_WORKERS (int): Locales of the multi-locale search
+    and number of them searched concurrently.
+  - CARDS_BATCH_SIZE, CARDS_SCROLL_THRESHOLD (int): Settings of the lazy rendering of movie cards.
+  - POSTER_HEIGHT, POSTER_CACHE_SIZE (int): Height (pixels) of the posters in the movie cards and
+    size (bytes) of the local thumbnail cache.
+  - SEARCH_DEBOUNCE (float), SEARCH_MIN_CHARS (int): Settings of the search as the user types.
+  - TITLE_INDEX_SIZE, TITLE_SUGGESTIONS (int), TITLE_MIN_SIMILARITY (float): Settings of the
+    local title index suggesting titles as the user types.
+  - PREFETCH_TOP_K, PREFETCH_WORKERS, PREFETCH_BUDGET (int), PREFETCH_WINDOW (float): Settings of
+    the speculative prefetch of offers for the top search results.
+  - SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL (int): Size and lifetime (seconds) of cached searches.
+  - OFFERS_CACHE_SIZE, OFFERS_CACHE_TTL (int): Size and lifetime (seconds) of cached offers.
+  - DISK_CACHE_SIZE, DISK_CACHE_MAX_STALE (int): Size (bytes) and maximum staleness (seconds)
+    of the on-disk cache.
+  - DISK_SEARCH_TTL, DISK_OFFERS_TTL (int): Lifetime (seconds) of searches and offers on disk.
+  - OFFERS_SHARD_SIZE, OFFERS_WORKERS, OFFERS_RETRIES (int), OFFERS_BACKOFF (float): Settings
+    of the sharded offers fetch.
+  - SEARCH_RETRIES (int): Number of times a failed search is retried.
+  - JUSTWATCH_API_URL (str): Address of the JustWatch GraphQL API.
+  - HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_POOL_TIMEOUT, HTTP_KEEPALIVE (float),
+    HTTP_POOL_SIZE (int),
+    HTTP_COMPRESSION (bool): Settings of the HTTP client used for the JustWatch API.
+  - UPSTREAM_RATE, UPSTREAM_BACKOFF_MAX (float), UPSTREAM_BURST (int): Rate limit and retry
+    delay of the requests sent upstream.
+  - BREAKER_THRESHOLD (int), BREAKER_COOLDOWN (float): Settings of the circuit breaker of the
+    requests sent upstream.
+  - BATCH_WORKERS (int): Default number of titles looked up at the same time by `batch.py`.
+  - SERVER_PORT (int), SERVER_RATE (float), SERVER_BURST (int): Default port and rate limit of
+    the shared server started with `server.py`.
+  - WATCHLIST_INTERVAL, WATCHLIST_WINDOW, WATCHLIST_MIN_AGE (float), WATCHLIST_BUDGET (int):
+    Settings of the background refresh of the watchlist.
 """
 
-import pycountry
+ALL_COUNTRIES = set(
+    "AD AE AF AG AI AL AM AO AQ AR AS AT AU AW AX AZ BA BB BD BE BF BG BH BI BJ BL BM BN "
+    "BO BQ BR BS BT BV BW BY BZ CA CC CD CF CG CH CI CK CL CM CN CO CR CU CV CW CX CY CZ "
+    "DE DJ DK DM DO DZ EC EE EG EH ER ES ET FI FJ FK FM FO FR GA GB GD GE GF GG GH GI GL "
+    "GM GN GP GQ GR GS GT GU GW GY HK HM HN HR HT HU ID IE IL IM IN IO IQ IR IS IT JE JM "
+    "JO JP KE KG KH KI KM KN KP KR KW KY KZ LA LB LC LI LK LR LS LT LU LV LY MA MC MD ME "
+    "MF MG MH MK ML MM MN MO MP MQ MR MS MT MU MV MW MX MY MZ NA NC NE NF NG NI NL NO NP "
+    "NR NU NZ OM PA PE PF PG PH PK PL PM PN PR PS PT PW PY QA RE RO RS RU RW SA SB SC SD "
+    "SE SG SH SI SJ SK SL SM SN SO SR SS ST SV SX SY SZ TC TD TF TG TH TJ TK TL TM TN TO "
+    "TR TT TV TW TZ UA UG UM US UY UZ VA VC VE VG VI VN VU WF WS YE YT ZA ZM ZW".split()
+)
+"""
+This set contains the 2-letter ISO codes (e.g., 'US', 'IT') for all countries, as listed by
+the `pycountry` library (version 23.12.11). The codes are precomputed, rather than read from
+the `pycountry` database at import time, to shorten the startup of the application.
+"""
 
-ALL_COUNTRIES = {country.alpha_2 for country in pycountry.countries}
+REGIONS = {
+    "EU": {
+        "AT",
+        "BE",
+        "BG",
+        "HR",
+        "CY",
+        "CZ",
+        "DK",
+        "EE",
+        "FI",
+        "FR",
+        "DE",
+        "GR",
+        "HU",
+        "IE",
+        "IT",
+        "LV",
+        "LT",
+        "LU",
+        "MT",
+        "NL",
+        "PL",
+        "PT",
+        "RO",
+        "SK",
+        "SI",
+        "ES",
+        "SE",
+    },
+    "NORDICS": {"DK", "FI", "IS", "NO", "SE"},
+    "NORTHAM": {"US", "CA", "MX"},
+    "LATAM": {
+        "AR",
+        "BO",
+        "BR",
+        "CL",
+        "CO",
+        "CR",
+        "CU",
+        "DO",
+        "EC",
+        "SV",
+        "GT",
+        "HN",
+        "MX",
+        "NI",
+        "PA",
+        "PY",
+        "PE",
+        "UY",
+        "VE",
+    },
+    "APAC": {
+        "AU",
+        "NZ",
+        "JP",
+        "KR",
+        "CN",
+        "HK",
+        "TW",
+        "SG",
+        "MY",
+        "TH",
+        "ID",
+        "PH",
+        "VN",
+        "IN",
+    },
+}
 """
-This set contains the 2-letter ISO codes (e.g., 'US', 'IT') for all countries retrieved 
-from the `pycountry` library. This can be used to filter or validate movie data based 
-on country of origin.
+This dictionary maps region presets to the 2-letter ISO codes of their countries. Region
+names can be used in the offers scope of the search bar to restrict the countries searched.
+They must not be ISO codes of countries, which take precedence over them.
 """
 
 GENRE_MAPPING = {
@@ -85,3 +203,214 @@ This set contains a service name that might be considered a duplicate of another
 in the `INCLUDED_SERVICES` set. This can be helpful for identifying and potentially merging 
 duplicate entries for the same streaming service with slightly different names.
 """
+
+OFFERS_PAGE_SIZE = 25
+"""
+This number defines how many countries are displayed at a time in the offers table. Only the
+rows of the current page are built and sent to the client.
+"""
+
+SEARCH_RESULTS = 4
+"""
+This number defines how many movies are requested to JustWatch for each search. Every
+result carries all of its offers, so that each additional result makes the responses of
+the searches run while typing larger.
+"""
+
+SEARCH_LOCALES = [
+    ("US", "en"),
+    ("GB", "en"),
+    ("FR", "fr"),
+    ("DE", "de"),
+    ("IT", "it"),
+    ("ES", "es"),
+    ("BR", "pt"),
+    ("JP", "ja"),
+]
+SEARCH_WORKERS = len(SEARCH_LOCALES)
+"""
+Country and language pairs searched when "ANY" is typed as the country code, and maximum
+number of locales searched at the same time.
+"""
+
+CARDS_BATCH_SIZE = 3
+CARDS_SCROLL_THRESHOLD = 600
+"""
+Number of movie cards rendered at a time, and the distance in pixels from the bottom of the
+page within which scrolling renders the next batch. A batch must be taller than the window so
+that the page can be scrolled.
+"""
+
+POSTER_HEIGHT = 420
+POSTER_CACHE_SIZE = 100 * 1024 * 1024
+"""
+Height in pixels of the posters displayed in the movie cards, which are downscaled to this
+height before being stored, and maximum size in bytes of the local thumbnail cache.
+"""
+
+SEARCH_DEBOUNCE = 0.35
+SEARCH_MIN_CHARS = 3
+"""
+Number of seconds the user must stop typing in the movie title field before a search is
+made, and the minimum number of characters required to search as the user types.
+"""
+
+TITLE_INDEX_SIZE = 20000
+TITLE_SUGGESTIONS = 6
+"""
+Maximum number of titles kept in the local index of the titles seen in searches, and number
+of titles suggested from it as the user types.
+"""
+
+TITLE_MIN_SIMILARITY = 0.5
+"""
+Minimum share, between 0 and 1, of the trigrams of the text typed a title must contain to be
+suggested.
+"""
+
+PREFETCH_TOP_K = 3
+PREFETCH_WORKERS = 1
+"""
+Number of search results whose offers are fetched in the background before the user opens
+them, and the number of titles prefetched at the same time.
+"""
+
+PREFETCH_BUDGET = 12
+PREFETCH_WINDOW = 60.0
+"""
+Maximum number of titles prefetched within a window of `PREFETCH_WINDOW` seconds, so that
+bursts of searches do not turn into bursts of requests to JustWatch.
+"""
+
+SEARCH_CACHE_SIZE = 128
+SEARCH_CACHE_TTL = 15 * 60
+"""
+Maximum number of search results kept in memory and the number of seconds after which
+they are fetched again from JustWatch.
+"""
+
+OFFERS_CACHE_SIZE = 64
+OFFERS_CACHE_TTL = 60 * 60
+"""
+Maximum number of movie offers kept in memory and the number of seconds after which
+they are fetched again from JustWatch. Offers change less often than search results.
+"""
+
+DISK_CACHE_SIZE = 64 * 1024 * 1024
+DISK_CACHE_MAX_STALE = 30 * 24 * 60 * 60
+"""
+Maximum size in bytes of the on-disk cache of JustWatch responses, and the number of seconds
+an expired entry can still be displayed while a fresh copy is downloaded in the background.
+"""
+
+DISK_SEARCH_TTL = 6 * 60 * 60
+DISK_OFFERS_TTL = 24 * 60 * 60
+"""
+Number of seconds after which searches and offers stored on disk are considered stale and
+refreshed in the background.
+"""
+
+OFFERS_SHARD_SIZE = 32
+OFFERS_WORKERS = 8
+"""
+Number of countries requested in a single offers call and maximum number of calls running
+concurrently. With about 250 countries, offers are fetched in 8 parallel shards. A shard size
+of 0 fetches every country in a single call.
+"""
+
+OFFERS_RETRIES = 2
+OFFERS_BACKOFF = 0.5
+"""
+Number of times a failed offers shard is retried and the bound in seconds of the random delay
+before the first retry, doubled after every failure.
+"""
+
+SEARCH_RETRIES = 1
+"""
+Number of times a failed search is retried.
+"""
+
+JUSTWATCH_API_URL = "https://apis.justwatch.com/graphql"
+"""
+Address of the JustWatch GraphQL API. It can be overridden with the `WATCH_MOVIES_API_URL`
+environment variable, e.g. to point the application at a local server.
+"""
+
+HTTP_TIMEOUT = 10.0
+HTTP_CONNECT_TIMEOUT = 5.0
+HTTP_POOL_TIMEOUT = 10.0
+"""
+Number of seconds to wait for a response from the JustWatch API, for a connection to be
+established, and for a connection of the pool to be free.
+"""
+
+HTTP_POOL_SIZE = OFFERS_WORKERS + 2
+HTTP_KEEPALIVE = 60.0
+"""
+Maximum number of connections to the JustWatch API, which are kept alive for reuse, and the
+number of seconds an idle connection is kept open. Searches, offers shards, prefetch,
+watchlist refreshes, batch lookups and server requests can all call the API at the same
+time, so the number of requests in flight is capped at the pool size by the limiter of
+`helpers` rather than by the number of threads: requests wait there, where the wait adapts
+to the responses, instead of waiting for a connection.
+"""
+
+HTTP_COMPRESSION = True
+"""
+Whether responses of the JustWatch API are requested compressed.
+"""
+
+UPSTREAM_RATE = 40.0
+UPSTREAM_BURST = 4 * OFFERS_WORKERS
+"""
+Number of requests per second sent to the JustWatch API (or the shared server) on average,
+and number of requests that can be sent in a burst.
+"""
+
+UPSTREAM_BACKOFF_MAX = 8.0
+"""
+Maximum delay in seconds before retrying a failed request.
+"""
+
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+"""
+Number of consecutive failed requests after which requests fail immediately, and number of
+seconds before a request is tried again.
+"""
+
+BATCH_WORKERS = 4
+"""
+Default number of titles looked up at the same time by the command line batch mode. Each of
+them also fetches its offers in concurrent shards.
+"""
+
+SERVER_PORT = 8765
+"""
+Default port of the shared server started with `server.py`.
+"""
+
+SERVER_RATE = 5.0
+SERVER_BURST = 20
+"""
+Number of requests per second each client of the shared server is allowed on average, and
+number of requests it can send in a burst.
+"""
+
+WATCHLIST_INTERVAL = 30.0
+"""
+Number of seconds between two refreshes of watchlist titles, so that refreshes are spread
+over time instead of being sent in bursts.
+"""
+
+WATCHLIST_BUDGET = 20
+WATCHLIST_WINDOW = 3600.0
+"""
+Maximum number of watchlist titles refreshed within `WATCHLIST_WINDOW` seconds.
+"""
+
+WATCHLIST_MIN_AGE = 6 * 60 * 60.0
+"""
+Number of seconds after which the offers of a watchlist title are refreshed. Titles whose
+offers changed recently are refreshed up to twice as often.
+"""
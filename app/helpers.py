@@ -4,16 +4,191 @@ This module provides functionalities for searching movie information.
 Includes functions:
   - find_titles(movie_title: str, country: str, language: str):
       Searches for movie titles based on given parameters.
-  - find_offers(movie_id: str):
+  - find_titles_by_prefix(movie_title: str, country: str, language: str):
+      Answers a search from the cached results of a prefix of the title.
+  - find_titles_multi(movie_title: str, locales: list) -> SearchResults:
+      Searches for a title in several locales concurrently and merges the results.
+  - resolve_locales(country: str, language: str) -> list:
+      Converts the country and language codes typed by the user into locales to search.
+  - merge_search_results(movie_title: str, results: list) -> SearchResults:
+      Deduplicates and ranks the results of a search in several locales.
+  - find_offers(movie_id: str, countries: set | None = None):
       Searches for streaming offers for a movie.
+  - refresh_offers(movie_id: str, countries: set | None = None):
+      Retrieves the offers of a movie ignoring the cached ones.
+  - iter_offers(movie_id: str, home_country: str | None = None, countries: set | None = None):
+      Yields the streaming offers for a movie as each shard of countries is received.
+  - resolve_countries(scope: str, home_country: str) -> set:
+      Converts the offers scope typed by the user into a set of countries.
+  - group_offers(offers: dict) -> dict:
+      Groups the raw offers of each country by streaming service.
+  - fetch_offers_sharded(movie_id: str, countries: set, ...) -> dict:
+      Retrieves the raw offers of a movie splitting the countries into concurrent shards.
   - complete_dict(dictionary: dict) -> dict:
       Processes a dictionary to remove duplicates and include all services.
+  - open_snapshot(path: str | None):
+      Opens the offline snapshot searches and offers are answered from.
+  - offers_as_dict(offers: dict) -> dict:
+      Converts the offers matrix of a movie to nested dictionaries.
+  - offers_from_dict(offers: dict) -> dict:
+      Converts nested dictionaries back to the offers matrix of a movie.
+  - movie_to_dict(movie: MediaEntry) -> dict, movie_from_dict(data: dict) -> MediaEntry:
+      Convert a movie to a JSON serializable dictionary and back.
+  - set_client(client: httpx.Client | None):
+      Replaces the HTTP client used to send requests to JustWatch.
+  - cache_stats() -> dict:
+      Returns the hit and miss counters of the search and offers caches.
+
+Results of `find_titles` and `find_offers` are kept in bounded in-process caches so that
+going back and forth between the search results and the offers page is free. The raw
+JustWatch responses are also persisted on disk: fresh entries are served directly, while
+stale ones are served immediately and refreshed in the background. Identical requests in
+flight at the same time, e.g. from a prefetch and a click, share a single upstream call.
+
+Requests are built and parsed with `simplejustwatchapi`, but sent through a single pooled
+HTTP client owned by this module, so that connections are kept alive and reused across
+searches and offers lookups. HTTP/2 is used if the `h2` package is installed. Another client
+can be injected with `set_client`. Every request goes through the rate limiter, adaptive
+concurrency limit and circuit breaker of `throttle`, and failed ones are retried after a
+jittered backoff. `simplejustwatchapi` and `httpx` are imported on the first
+request rather than with this module, so that they do not delay the appearance of the
+search window.
+
+If `WATCH_MOVIES_SERVER` is set to the address of a shared server started with `server.py`,
+searches and offers are requested from it instead of JustWatch, so that the instances of an
+office share its cache. If `WATCH_MOVIES_SNAPSHOT` is set to a snapshot file written by
+`snapshot.py`, searches and offers that cannot reach JustWatch are answered from it, and
+with `WATCH_MOVIES_OFFLINE` set to 1 they are answered from it only.
 """
 
+import os
+import threading
+import time
 from collections import defaultdict
-from simplejustwatchapi import search, offers_for_countries
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+from cache import CountingCache
+from instrumentation import count, span
+from storage import DiskCache, user_cache_dir
+from throttle import AdaptiveLimiter, CircuitBreaker, backoff
+from constants import (
+    ALL_COUNTRIES,
+    INCLUDED_SERVICES,
+    DUPLICATED_SERVICE,
+    ORDERED_SERVICES,
+    SEARCH_CACHE_SIZE,
+    SEARCH_CACHE_TTL,
+    OFFERS_CACHE_SIZE,
+    OFFERS_CACHE_TTL,
+    DISK_CACHE_SIZE,
+    DISK_CACHE_MAX_STALE,
+    DISK_SEARCH_TTL,
+    DISK_OFFERS_TTL,
+    OFFERS_SHARD_SIZE,
+    OFFERS_WORKERS,
+    OFFERS_RETRIES,
+    OFFERS_BACKOFF,
+    SEARCH_RETRIES,
+    REGIONS,
+    SEARCH_RESULTS,
+    SEARCH_LOCALES,
+    SEARCH_WORKERS,
+    JUSTWATCH_API_URL,
+    HTTP_TIMEOUT,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_POOL_TIMEOUT,
+    HTTP_POOL_SIZE,
+    HTTP_KEEPALIVE,
+    HTTP_COMPRESSION,
+    UPSTREAM_RATE,
+    UPSTREAM_BURST,
+    UPSTREAM_BACKOFF_MAX,
+    BREAKER_THRESHOLD,
+    BREAKER_COOLDOWN,
+)
+
+SEARCH_CACHE = CountingCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, "search")
+OFFERS_CACHE = CountingCache(OFFERS_CACHE_SIZE, OFFERS_CACHE_TTL, "offers")
+DISK_CACHE = DiskCache(
+    os.path.join(user_cache_dir(), "cache.sqlite3"),
+    DISK_CACHE_SIZE,
+    DISK_CACHE_MAX_STALE,
+)
+_REFRESHING = set()
+_REFRESHING_LOCK = threading.Lock()
+_OFFERS_POOL = ThreadPoolExecutor(OFFERS_WORKERS, thread_name_prefix="offers")
+_SEARCH_POOL = ThreadPoolExecutor(SEARCH_WORKERS, thread_name_prefix="search")
+_IN_FLIGHT = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+API_URL = os.environ.get("WATCH_MOVIES_API_URL", JUSTWATCH_API_URL)
+SERVER_URL = os.environ.get("WATCH_MOVIES_SERVER") or None
+SNAPSHOT_PATH = os.environ.get("WATCH_MOVIES_SNAPSHOT") or None
+OFFLINE = os.environ.get("WATCH_MOVIES_OFFLINE", "").lower() in ("1", "true")
+_SNAPSHOT = None
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+_LIMITER = AdaptiveLimiter(UPSTREAM_RATE, UPSTREAM_BURST, HTTP_POOL_SIZE)
+_BREAKER = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN)
+_ALL_SERVICES = set(INCLUDED_SERVICES) | DUPLICATED_SERVICE
+_SERVICE_COLUMNS = {
+    name: ORDERED_SERVICES.index(service) for name, service in INCLUDED_SERVICES.items()
+}
+_DUPLICATE_COLUMN = len(ORDERED_SERVICES)
+_SERVICE_COLUMNS.update(dict.fromkeys(DUPLICATED_SERVICE, _DUPLICATE_COLUMN))
+_AMAZON_COLUMN = _SERVICE_COLUMNS["Amazon Video"]
+
+
+class Offer:
+    """
+    This class holds the URL and price of the offer of a streaming service in a country.
+    Offers are stored in the rows of the offers matrix returned by `find_offers`.
+    """
+
+    __slots__ = ("url", "price")
+
+    def __init__(self, url: str, price: str | None = None):
+        """
+        Initializes the offer.
+
+        Args:
+            url: Address of the movie on the website of the streaming service.
+            price: Price of the offer, or None if it is included in a subscription.
+        """
+        self.url = url
+        self.price = price
 
-from constants import ALL_COUNTRIES, INCLUDED_SERVICES, DUPLICATED_SERVICE
+    def to_dict(self) -> dict:
+        """
+        Returns the offer as a dictionary with "url" and "price" keys, as stored by
+        `complete_dict`.
+        """
+        return {"url": self.url, "price": self.price}
+
+
+class PartialOffers(dict):
+    """
+    This class holds the offers, raw or grouped, of the shards that were fetched
+    successfully, while `failed` contains the countries of the shards that kept failing.
+    Partial results are never persisted, so that missing rows are fetched again on the next
+    access.
+    """
+
+    def __init__(self, offers: dict, failed: set):
+        super().__init__(offers)
+        self.failed = failed
+
+
+class SearchResults(list):
+    """
+    This class holds the merged movies of a multi-locale search, best match first. `titles`
+    maps the identifier of each movie to its title in each locale that returned it, keyed
+    by "country-language", and `failed` lists the locales whose search failed.
+    """
+
+    def __init__(self, movies: list, titles: dict, failed: list):
+        super().__init__(movies)
+        self.titles = titles
+        self.failed = failed
 
 
 def find_titles(movie_title: str, country: str, language: str):
@@ -28,43 +203,1060 @@ def find_titles(movie_title: str, country: str, language: str):
     Returns:
         A list of movie titles that match the search criteria.
     """
+    movie_title = " ".join(movie_title.split())
     country = country[:2].upper()
     language = language[:2].lower()
-    return search(movie_title, country=country, language=language, best_only=False)
+    key = (movie_title.casefold(), country, language)
+
+    def fetch():
+        movies = _cached_fetch(
+            "search",
+            "|".join(key),
+            DISK_SEARCH_TTL,
+            lambda: _search(movie_title, country, language),
+            lambda: SEARCH_CACHE.pop(key),
+        )
+        SEARCH_CACHE.set(key, movies)
+        return movies
+
+    movies = SEARCH_CACHE.get(key)
+    if movies is None:
+        movies = _with_snapshot(
+            fetch, lambda snapshot: snapshot.find_titles(movie_title)
+        )
+    return movies
+
+
+def _search(movie_title: str, country: str, language: str) -> list:
+    """
+    This function sends a search request to JustWatch.
+
+    Args:
+        movie_title: Normalized title of the movie to search for.
+        country: 2-letter ISO code of the country.
+        language: 2-letter code of the language.
+
+    Returns:
+        The list of movies returned by `search`.
+    """
+    key = ("search", movie_title.casefold(), country, language)
+    return _single_flight(key, lambda: _request_search(movie_title, country, language))
 
 
-def find_offers(movie_id: str):
+def _request_search(movie_title: str, country: str, language: str) -> list:
+    """
+    This function sends a search request to JustWatch, or to the shared server if
+    `SERVER_URL` is set, without coalescing it.
+
+    Args:
+        movie_title: Normalized title of the movie to search for.
+        country: 2-letter ISO code of the country.
+        language: 2-letter code of the language.
+
+    Returns:
+        The list of movies returned by `search`.
+    """
+    if SERVER_URL:
+        params = {"title": movie_title, "country": country, "language": language}
+        body = _get_remote("search", params, SEARCH_RETRIES)
+        return [movie_from_dict(movie) for movie in body["movies"]]
+
+    from simplejustwatchapi.query import parse_search_response, prepare_search_request
+
+    count("requests.search")
+    with span("network.search", country=country, language=language) as s:
+        request = prepare_search_request(
+            movie_title, country, language, SEARCH_RESULTS, False
+        )
+        movies = parse_search_response(_post(request, SEARCH_RETRIES))
+        s.set(results=len(movies))
+    return movies
+
+
+def find_titles_by_prefix(movie_title: str, country: str, language: str):
+    """
+    This function answers a search provisionally from the cached results of the longest
+    prefix of the title already searched, keeping the movies whose title contains the text
+    typed. Since JustWatch also returns fuzzy and localized matches, the results of the
+    title itself may differ: they are returned as cached if it has been searched, and
+    otherwise the search is still to be run.
+
+    Args:
+        movie_title: Partial or full title of the movie to search for.
+        country: Country of origin of the movie (if known).
+        language: Language of the movie (if known).
+
+    Returns:
+        The list of movies, or None if no prefix has been searched.
+    """
+    query = " ".join(movie_title.split()).casefold()
+    country = country[:2].upper()
+    language = language[:2].lower()
+    best_prefix, best_movies = "", None
+    for (prefix, c, l), movies in SEARCH_CACHE.items():
+        if (c, l) != (country, language) or not query.startswith(prefix):
+            continue
+        if best_movies is None or len(prefix) > len(best_prefix):
+            best_prefix, best_movies = prefix, movies
+    if best_movies is None or best_prefix == query:
+        return best_movies
+    return [m for m in best_movies if query in (m.title or "").casefold()]
+
+
+def resolve_locales(country: str, language: str) -> list:
+    """
+    This function converts the country and language codes typed by the user into the
+    locales to search in.
+
+    Args:
+        country: Comma or space separated list of 2-letter ISO codes, or "ANY" for every
+            locale of `SEARCH_LOCALES`.
+        language: Comma or space separated list of 2-letter language codes, paired with the
+            countries in order. The last language is used for the remaining countries.
+
+    Returns:
+        A list of `(country, language)` tuples without duplicates. It contains the codes as
+        typed if there is a single country and language.
+    """
+    countries = country.replace(",", " ").upper().split()
+    languages = language.replace(",", " ").lower().split()
+    if "ANY" in countries:
+        return list(SEARCH_LOCALES)
+    if len(countries) <= 1 and len(languages) <= 1:
+        return [(country, language)]
+    countries = countries or ["US"]
+    languages = languages or ["en"]
+    size = max(len(countries), len(languages))
+    locales = [
+        (countries[min(i, len(countries) - 1)], languages[min(i, len(languages) - 1)])
+        for i in range(size)
+    ]
+    return list(dict.fromkeys(locales))
+
+
+def find_titles_multi(movie_title: str, locales: list) -> SearchResults:
+    """
+    This function searches for a title in several locales at the same time, e.g. to find a
+    movie whose local title is unknown, and merges the results with `merge_search_results`.
+    Each locale goes through `find_titles`, and is therefore cached separately.
+
+    Args:
+        movie_title: Partial or full title of the movie to search for.
+        locales: List of `(country, language)` tuples, in order of preference.
+
+    Returns:
+        The merged movies. Locales whose search failed are listed in `failed`.
+
+    Raises:
+        Exception: The error of the first locale, if the search failed in every locale.
+    """
+    with span("search.multi", locales=len(locales)) as s:
+        futures = [
+            _SEARCH_POOL.submit(find_titles, movie_title, country, language)
+            for country, language in locales
+        ]
+        results, failed, error = [], [], None
+        for locale, future in zip(locales, futures):
+            try:
+                results.append((locale, future.result()))
+            except Exception as e:
+                failed.append(locale)
+                error = error or e
+        if not results:
+            raise error
+        merged = merge_search_results(movie_title, results)
+        merged.failed = failed
+        s.set(results=len(merged), failed=len(failed))
+    return merged
+
+
+def merge_search_results(movie_title: str, results: list) -> SearchResults:
+    """
+    This function merges the results of the searches of a title in several locales.
+
+    Movies are deduplicated by `entry_id`, keeping the details of the first locale that
+    returned them. They are ranked by the sum over the locales of the inverse of their rank
+    in each one, after the movies having a localized title equal to the title searched.
+
+    Args:
+        movie_title: The title searched.
+        results: List of `((country, language), movies)` tuples, in order of preference.
+
+    Returns:
+        At most `SEARCH_RESULTS` movies, best match first, with their localized titles.
+    """
+    query = " ".join(movie_title.split()).casefold()
+    movies, titles, scores = {}, {}, defaultdict(float)
+    for (country, language), found in results:
+        locale = f"{country[:2].upper()}-{language[:2].lower()}"
+        for rank, movie in enumerate(found):
+            movies.setdefault(movie.entry_id, movie)
+            titles.setdefault(movie.entry_id, {})[locale] = movie.title
+            scores[movie.entry_id] += 1 / (rank + 1)
+    exact = {
+        entry_id
+        for entry_id, localized in titles.items()
+        if any((title or "").casefold() == query for title in localized.values())
+    }
+    ranked = sorted(movies, key=lambda i: (i not in exact, -scores[i]))[:SEARCH_RESULTS]
+    return SearchResults(
+        [movies[i] for i in ranked], {i: titles[i] for i in ranked}, []
+    )
+
+
+def find_offers(movie_id: str, countries: set | None = None):
     """
     This function searches for streaming offers for a given movie.
 
     Args:
         movie_id: Unique identifier of the movie to search offers for.
+        countries: 2-letter ISO codes of the countries to search offers in. By default,
+            every country is searched.
 
     Returns:
-        A dictionary containing streaming service names as keys and their corresponding prices
-        (or subscription plans) as values. If no offers are found, an empty dictionary is returned.
+        The offers matrix of the movie: a dictionary mapping each country with offers to a
+        tuple holding, for each service of `ORDERED_SERVICES` in the same order, its `Offer`
+        or None. If no offers are found, an empty dictionary is returned.
 
     Raises:
         ValueError: If the movie_id is invalid.
     """
-    offers = offers_for_countries(movie_id, ALL_COUNTRIES, best_only=False)
-    final_dict = {}
-    for k, v in offers.items():
-        if not v:
+    countries = ALL_COUNTRIES if countries is None else countries
+    cached = _cached_offers(movie_id, countries)
+    if cached is not None:
+        return cached
+    key = ("find_offers", _offers_key(movie_id, countries))
+    return _with_snapshot(
+        lambda: _single_flight(key, lambda: _fetch_offers(movie_id, countries)),
+        lambda snapshot: snapshot.find_offers(movie_id, countries) or {},
+    )
+
+
+def refresh_offers(movie_id: str, countries: set | None = None) -> dict:
+    """
+    This function retrieves the offers of a movie from JustWatch, ignoring the cached ones,
+    and caches the new offers.
+
+    Args:
+        movie_id: Unique identifier of the movie to search offers for.
+        countries: 2-letter ISO codes of the countries to search offers in. By default,
+            every country is searched.
+
+    Returns:
+        A dictionary with the structure returned by `find_offers`, or a `PartialOffers` if
+        the offers of some countries could not be retrieved.
+    """
+    countries = ALL_COUNTRIES if countries is None else countries
+    key = ("refresh_offers", _offers_key(movie_id, countries))
+    return _single_flight(key, lambda: _fetch_offers(movie_id, countries))
+
+
+def _fetch_offers(movie_id: str, countries: set) -> dict:
+    """
+    This function retrieves, groups and caches the offers of a movie.
+
+    Args:
+        movie_id: Unique identifier of the movie to search offers for.
+        countries: 2-letter ISO codes of the countries to search offers in.
+
+    Returns:
+        A dictionary with the structure returned by `find_offers`, or a `PartialOffers` if
+        the offers of some countries could not be retrieved.
+    """
+    if SERVER_URL:
+        return _fetch_remote_offers(movie_id, countries)
+    offers = fetch_offers_sharded(movie_id, countries)
+    final_dict = group_offers(offers)
+    if isinstance(offers, PartialOffers):
+        return PartialOffers(final_dict, offers.failed)
+    _store_offers(movie_id, countries, offers, final_dict)
+    return final_dict
+
+
+def iter_offers(
+    movie_id: str, home_country: str | None = None, countries: set | None = None
+):
+    """
+    This function searches for streaming offers for a given movie, yielding them as soon as
+    each shard of countries is received. The shard containing only the home country is
+    requested first, so that its row can be displayed straight away. If the same offers
+    are already being fetched, e.g. by a prefetch, their result is awaited and yielded at
+    once instead.
+
+    Args:
+        movie_id: Unique identifier of the movie to search offers for.
+        home_country: 2-letter ISO code of the country the user is interested in (optional).
+        countries: 2-letter ISO codes of the countries to search offers in. By default,
+            every country is searched.
+
+    Yields:
+        Dictionaries with the same structure returned by `find_offers`, one per shard. If the
+        offers are cached, a single dictionary with every country is yielded.
+
+    Raises:
+        Exception: The last error raised if every shard failed.
+    """
+    countries = ALL_COUNTRIES if countries is None else countries
+    # Looked up first: a fetch completing in between has cached its offers.
+    future = _offers_in_flight(movie_id, countries)
+    cached = _cached_offers(movie_id, countries)
+    if cached is not None:
+        yield cached
+        return
+    if future is not None:
+        try:
+            shared = future.result()
+        except Exception:
+            # The offers are requested again below, shard by shard.
+            shared = None
+        if shared is not None:
+            count("coalesced.iter_offers")
+            yield {k: v for k, v in shared.items() if k in countries}
+            return
+    if SERVER_URL or OFFLINE and _snapshot() is not None:
+        yield find_offers(movie_id, countries)
+        return
+    offers, failed, error = {}, set(), None
+    for shard, result in _iter_offer_shards(movie_id, countries, home_country):
+        if isinstance(result, Exception):
+            failed.update(shard)
+            error = result
             continue
-        services = defaultdict(lambda: {"url": None, "price": None})
-        for offer in v:
-            services[offer.package.name]["url"] = offer.url
-            if services[offer.package.name]["price"] is None:
-                services[offer.package.name]["price"] = offer.price_string
-        final_dict[k] = services
-    return complete_dict(final_dict)
+        offers.update(result)
+        yield group_offers(result)
+    if failed and not offers:
+        snapshot = _snapshot()
+        found = snapshot and snapshot.find_offers(movie_id, countries)
+        if not found:
+            raise error
+        count("snapshot.fallback")
+        yield found
+    if not failed:
+        _store_offers(movie_id, countries, offers, group_offers(offers))
+
+
+def resolve_countries(scope: str, home_country: str) -> set:
+    """
+    This function converts the offers scope typed by the user into a set of countries.
+
+    Args:
+        scope: Comma or space separated list of 2-letter ISO codes, region names from
+            `REGIONS`, "HOME" for the home country or "ALL" for every country. ISO codes
+            take precedence over region names.
+        home_country: 2-letter ISO code of the country typed in the search bar.
+
+    Returns:
+        The set of 2-letter ISO codes to search offers in. If the scope does not contain any
+        valid country, every country is returned.
+    """
+    countries = set()
+    for token in scope.replace(",", " ").upper().split():
+        if token == "ALL":
+            return ALL_COUNTRIES
+        if token == "HOME":
+            token = home_country[:2].upper()
+        if token in ALL_COUNTRIES:
+            countries.add(token)
+        else:
+            countries.update(REGIONS.get(token, set()) & ALL_COUNTRIES)
+    return countries or ALL_COUNTRIES
+
+
+def _fetch_remote_offers(movie_id: str, countries: set) -> dict:
+    """
+    This function retrieves the offers of a movie from the shared server and caches them in
+    memory.
+
+    Args:
+        movie_id: Unique identifier of the movie to search offers for.
+        countries: 2-letter ISO codes of the countries to search offers in.
+
+    Returns:
+        A dictionary with the structure returned by `find_offers`, or a `PartialOffers` if
+        the server could not retrieve the offers of some countries.
+    """
+    params = {"id": movie_id}
+    if countries != ALL_COUNTRIES:
+        params["countries"] = ",".join(sorted(countries))
+    body = _get_remote("offers", params, OFFERS_RETRIES)
+    final_dict = offers_from_dict(body["offers"])
+    if body["failed"]:
+        return PartialOffers(final_dict, set(body["failed"]))
+    OFFERS_CACHE.set(_offers_key(movie_id, countries), final_dict)
+    return final_dict
+
+
+def _offers_in_flight(movie_id: str, countries: set) -> Future | None:
+    """
+    This function looks for a request in flight retrieving the offers of a movie in the
+    given countries, or in every country, with `find_offers` or `refresh_offers`.
+
+    Args:
+        movie_id: Unique identifier of the movie.
+        countries: 2-letter ISO codes of the countries to search offers in.
+
+    Returns:
+        The future of the request, or None if there is none.
+    """
+    keys = [_offers_key(movie_id, countries), _offers_key(movie_id, ALL_COUNTRIES)]
+    with _IN_FLIGHT_LOCK:
+        for key in keys:
+            for kind in ("find_offers", "refresh_offers"):
+                future = _IN_FLIGHT.get((kind, key))
+                if future is not None:
+                    return future
+    return None
+
+
+def _offers_key(movie_id: str, countries: set) -> str:
+    """
+    This function returns the key under which the offers of a movie are cached.
+
+    Args:
+        movie_id: Unique identifier of the movie.
+        countries: 2-letter ISO codes of the countries the offers refer to.
+
+    Returns:
+        The movie ID if every country is included, otherwise the movie ID followed by the
+        sorted countries.
+    """
+    if countries == ALL_COUNTRIES:
+        return movie_id
+    return movie_id + "|" + ",".join(sorted(countries))
+
+
+def _cached_offers(movie_id: str, countries: set) -> dict | None:
+    """
+    This function looks up the offers of a movie in the memory and disk caches. Offers
+    cached for every country also answer requests for a subset of them. Stale entries on
+    disk are returned while a fresh copy is fetched in the background.
+
+    Args:
+        movie_id: Unique identifier of the movie.
+        countries: 2-letter ISO codes of the countries to search offers in.
+
+    Returns:
+        A dictionary with the structure returned by `find_offers`, or None if the offers are
+        not cached.
+    """
+    key = _offers_key(movie_id, countries)
+    keys = [key] if key == movie_id else [key, movie_id]
+    for k in keys:
+        cached = OFFERS_CACHE.get(k)
+        if cached is not None:
+            return _restrict_offers(cached, countries)
+    for k in keys:
+        offers, stale = DISK_CACHE.get("offers", k)
+        count(
+            "disk.offers." + ("miss" if offers is None else "stale" if stale else "hit")
+        )
+        if offers is None:
+            continue
+        if stale:
+            scope = ALL_COUNTRIES if k == movie_id else countries
+            _schedule_refresh(
+                "offers",
+                k,
+                DISK_OFFERS_TTL,
+                lambda scope=scope: fetch_offers_sharded(movie_id, scope),
+                lambda k=k: OFFERS_CACHE.pop(k),
+            )
+        cached = group_offers(offers)
+        OFFERS_CACHE.set(k, cached)
+        return _restrict_offers(cached, countries)
+    return None
+
+
+def _store_offers(movie_id: str, countries: set, offers: dict, final_dict: dict):
+    """
+    This function stores the offers of a movie in the memory and disk caches.
+
+    Args:
+        movie_id: Unique identifier of the movie.
+        countries: 2-letter ISO codes of the countries the offers refer to.
+        offers: The raw offers returned by `fetch_offers_sharded`.
+        final_dict: The offers grouped by `group_offers`.
+    """
+    key = _offers_key(movie_id, countries)
+    DISK_CACHE.set("offers", key, offers, DISK_OFFERS_TTL)
+    OFFERS_CACHE.set(key, final_dict)
+
+
+def _restrict_offers(final_dict: dict, countries: set) -> dict:
+    """
+    This function keeps only the offers of the given countries.
+
+    Args:
+        final_dict: A dictionary with the structure returned by `find_offers`.
+        countries: 2-letter ISO codes of the countries to keep.
+
+    Returns:
+        The same dictionary if every country is kept, otherwise a filtered copy.
+    """
+    if countries == ALL_COUNTRIES:
+        return final_dict
+    return {k: v for k, v in final_dict.items() if k in countries}
+
+
+def group_offers(offers: dict) -> dict:
+    """
+    This function groups the raw offers of each country by streaming service, in a single
+    pass over the offers.
+
+    Args:
+        offers: A dictionary mapping each country to its list of offers, as returned by
+            `offers_for_countries`.
+
+    Returns:
+        A dictionary with the structure returned by `find_offers`. Countries without offers
+        are left out.
+    """
+    with span("transform.group_offers", countries=len(offers)):
+        final_dict = {}
+        for k, v in offers.items():
+            if not v:
+                continue
+            row = [None] * (_DUPLICATE_COLUMN + 1)
+            for offer in v:
+                column = _SERVICE_COLUMNS.get(offer.package.name)
+                if column is None:
+                    continue
+                if row[column] is None:
+                    row[column] = Offer(offer.url, offer.price_string)
+                    continue
+                row[column].url = offer.url
+                if row[column].price is None:
+                    row[column].price = offer.price_string
+            duplicate = row.pop()
+            if row[_AMAZON_COLUMN] is None:
+                row[_AMAZON_COLUMN] = duplicate
+            final_dict[k] = tuple(row)
+        return final_dict
+
+
+def fetch_offers_sharded(
+    movie_id: str,
+    countries: set,
+    shard_size: int = OFFERS_SHARD_SIZE,
+    retries: int = OFFERS_RETRIES,
+) -> dict:
+    """
+    This function retrieves the raw offers of a movie, splitting the countries into shards
+    that are requested concurrently on a bounded worker pool. Failed shards are retried
+    with an exponential backoff; if they keep failing their countries are left out.
+
+    Args:
+        movie_id: Unique identifier of the movie to search offers for.
+        countries: 2-letter ISO codes of the countries to search offers in.
+        shard_size: Number of countries per request. If 0, a single request is made.
+        retries: Number of times a failed shard is retried.
+
+    Returns:
+        A dictionary mapping each country to its list of offers, as returned by
+        `offers_for_countries`. If some shards failed, a `PartialOffers` is returned.
+
+    Raises:
+        Exception: The last error raised if every shard failed.
+    """
+    offers, failed, error = {}, set(), None
+    shards = _iter_offer_shards(movie_id, countries, None, shard_size, retries)
+    for shard, result in shards:
+        if isinstance(result, Exception):
+            failed.update(shard)
+            error = result
+        else:
+            offers.update(result)
+    if failed and not offers:
+        raise error
+    return PartialOffers(offers, failed) if failed else offers
+
+
+def _iter_offer_shards(
+    movie_id: str,
+    countries: set,
+    first: str | None = None,
+    shard_size: int = OFFERS_SHARD_SIZE,
+    retries: int = OFFERS_RETRIES,
+):
+    """
+    This function requests the shards of countries concurrently and yields them in the
+    order they complete. Pending shards are cancelled if the generator is closed early.
+
+    Args:
+        movie_id: Unique identifier of the movie to search offers for.
+        countries: 2-letter ISO codes of the countries to search offers in.
+        first: Country requested on its own before any other shard (optional).
+        shard_size: Number of countries per request. If 0, a single request is made.
+        retries: Number of times a failed shard is retried.
+
+    Yields:
+        Tuples `(shard, result)`, where `shard` is the list of countries requested and
+        `result` either the raw offers of the shard or the exception that made it fail.
+    """
+    countries = sorted(countries)
+    shards = []
+    if first in countries:
+        countries.remove(first)
+        shards.append([first])
+    shard_size = shard_size or len(countries) or 1
+    shards += [
+        countries[i : i + shard_size] for i in range(0, len(countries), shard_size)
+    ]
+    futures = {
+        _OFFERS_POOL.submit(_fetch_offers_shard, movie_id, shard, retries): shard
+        for shard in shards
+    }
+    try:
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _fetch_offers_shard(movie_id: str, countries: list, retries: int) -> dict:
+    """
+    This function retrieves the raw offers of a movie for a single shard of countries.
+
+    Args:
+        movie_id: Unique identifier of the movie to search offers for.
+        countries: 2-letter ISO codes of the countries in the shard.
+        retries: Number of times the request is retried before giving up.
+
+    Returns:
+        A dictionary mapping each country of the shard to its list of offers.
+    """
+    key = ("offers", movie_id, tuple(countries))
+    return _single_flight(
+        key, lambda: _request_offers_shard(movie_id, countries, retries)
+    )
+
+
+def _request_offers_shard(movie_id: str, countries: list, retries: int) -> dict:
+    """
+    This function retrieves the raw offers of a movie for a single shard of countries,
+    without coalescing the request.
+
+    Args:
+        movie_id: Unique identifier of the movie to search offers for.
+        countries: 2-letter ISO codes of the countries in the shard.
+        retries: Number of times the request is retried before giving up.
+
+    Returns:
+        A dictionary mapping each country of the shard to its list of offers.
+    """
+    from simplejustwatchapi.query import (
+        parse_offers_for_countries_response,
+        prepare_offers_for_countries_request,
+    )
+
+    request = prepare_offers_for_countries_request(
+        movie_id, set(countries), "en", False
+    )
+    count("requests.offers")
+    try:
+        with span("network.offers", countries=len(countries)) as s:
+            offers = parse_offers_for_countries_response(
+                _post(request, retries), set(countries)
+            )
+            size = sum(len(v) for v in offers.values())
+            s.set(offers=size)
+    except Exception:
+        count("errors.offers")
+        raise
+    count("results.offers", size)
+    return offers
+
+
+def set_client(client):
+    """
+    This function replaces the HTTP client used to send requests to JustWatch, e.g. with
+    one configured for a proxy or a test server. The client is not closed by this module.
+
+    Args:
+        client (httpx.Client | None): The new client. If None, a pooled client is created
+            again with the default settings on the next request.
+    """
+    global _CLIENT
+    with _CLIENT_LOCK:
+        _CLIENT = client
+
+
+def _client():
+    """
+    This function returns the HTTP client used to send requests to JustWatch, creating it
+    on first use. The client keeps up to `HTTP_POOL_SIZE` connections alive, as many as the
+    requests `_LIMITER` lets in flight, and uses HTTP/2 if the `h2` package is installed.
+
+    Returns:
+        httpx.Client: The shared client.
+    """
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            import importlib.util
+
+            import httpx
+
+            _CLIENT = httpx.Client(
+                http2=importlib.util.find_spec("h2") is not None,
+                timeout=httpx.Timeout(
+                    HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT
+                ),
+                limits=httpx.Limits(
+                    max_connections=HTTP_POOL_SIZE,
+                    max_keepalive_connections=HTTP_POOL_SIZE,
+                    keepalive_expiry=HTTP_KEEPALIVE,
+                ),
+                headers={
+                    "Accept-Encoding": (
+                        "gzip, deflate" if HTTP_COMPRESSION else "identity"
+                    )
+                },
+            )
+        return _CLIENT
+
+
+def _post(request: dict, retries: int = 0) -> dict:
+    """
+    This function sends a GraphQL request to JustWatch through the shared HTTP client.
+
+    Args:
+        request: The JSON body of the request, as prepared by `simplejustwatchapi`.
+        retries: Number of times the request is retried if it fails transiently.
+
+    Returns:
+        The JSON body of the response.
+
+    Raises:
+        httpx.HTTPError: If the request fails or the response has an error status.
+        CircuitOpenError: If requests are paused after repeated failures.
+    """
+    return _send("POST", API_URL, retries, json=request)
+
+
+def _send(method: str, url: str, retries: int, **kwargs) -> dict:
+    """
+    This function sends a request upstream through the circuit breaker and the limiter.
+    Connection errors, timeouts, server errors and 429 responses halve the concurrency
+    limit and are retried after a jittered backoff, or after the delay requested by the
+    `Retry-After` header of the response.
+
+    Args:
+        method: The HTTP method.
+        url: The address of the request.
+        retries: Number of times the request is retried if it fails transiently.
+        **kwargs: Arguments of `httpx.Client.request`, e.g. `json` or `params`.
+
+    Returns:
+        The JSON body of the response.
+
+    Raises:
+        httpx.HTTPError: If the last attempt fails or the response has a client error
+            status. Other errors, e.g. `httpx.InvalidURL`, are raised without retrying.
+        CircuitOpenError: If requests are paused after repeated failures.
+    """
+    import httpx
+
+    for attempt in range(retries + 1):
+        _BREAKER.check()
+        started = _LIMITER.acquire()
+        # Any error other than an HTTP error, e.g. an invalid address, a closed client or
+        # a body which is not JSON, is not retried and tells nothing about the upstream
+        # API: the outcome stays unknown.
+        retry_after, transient, outcome = 0.0, False, None
+        try:
+            response = _client().request(method, url, **kwargs)
+            if response.status_code == 429 or response.status_code >= 500:
+                retry_after = _retry_after(response)
+            response.raise_for_status()
+            count("payload.bytes", len(response.content))
+            body = response.json()
+            outcome = True
+            return body
+        except httpx.HTTPError as e:
+            transient = not isinstance(e, httpx.HTTPStatusError) or (
+                e.response.status_code == 429 or e.response.status_code >= 500
+            )
+            outcome = not transient
+            if not transient or attempt == retries:
+                raise
+        finally:
+            _LIMITER.release(started, transient, retry_after)
+            _BREAKER.record(outcome)
+        count("requests.retries")
+        time.sleep(
+            retry_after or backoff(attempt, OFFERS_BACKOFF, UPSTREAM_BACKOFF_MAX)
+        )
+
+
+def _retry_after(response) -> float:
+    """
+    This function reads the delay requested by the `Retry-After` header of a response.
+
+    Args:
+        response (httpx.Response): The response.
+
+    Returns:
+        float: The delay in seconds, at most `UPSTREAM_BACKOFF_MAX`, or 0 if the header is
+        missing or is a date.
+    """
+    try:
+        return min(float(response.headers.get("Retry-After", 0)), UPSTREAM_BACKOFF_MAX)
+    except ValueError:
+        return 0.0
+
+
+def open_snapshot(path: str | None):
+    """
+    This function opens the offline snapshot used by `find_titles` and `find_offers`, or
+    closes it if no path is given. While `OFFLINE` is True, searches and offers are answered
+    from the snapshot only, otherwise it is used when JustWatch cannot be reached.
+
+    Args:
+        path: Location of a snapshot file written by `snapshot.py`.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If the file is not a valid snapshot.
+    """
+    global _SNAPSHOT, SNAPSHOT_PATH
+    from snapshot import Snapshot
+
+    if _SNAPSHOT is not None:
+        _SNAPSHOT.close()
+    _SNAPSHOT = Snapshot(path) if path else None
+    SNAPSHOT_PATH = path
+
+
+def _snapshot():
+    """
+    This function returns the offline snapshot, opening the one set in the
+    `WATCH_MOVIES_SNAPSHOT` environment variable on first use.
+
+    Returns:
+        Snapshot | None: The snapshot, or None if there is none or it cannot be opened.
+    """
+    global SNAPSHOT_PATH
+    if _SNAPSHOT is None and SNAPSHOT_PATH:
+        try:
+            open_snapshot(SNAPSHOT_PATH)
+        except (OSError, ValueError):
+            SNAPSHOT_PATH = None
+    return _SNAPSHOT
+
+
+def _with_snapshot(fetch, lookup):
+    """
+    This function answers a request from the network, or from the offline snapshot if
+    `OFFLINE` is True or the request fails.
+
+    Args:
+        fetch: Function without arguments answering the request online.
+        lookup: Function answering the request from the snapshot given as argument, which
+            returns an empty value if the snapshot does not contain the answer.
+
+    Returns:
+        The value returned by `fetch` or `lookup`.
+    """
+    snapshot = _snapshot()
+    if snapshot is None:
+        return fetch()
+    if OFFLINE:
+        return lookup(snapshot)
+    try:
+        return fetch()
+    except Exception:
+        found = lookup(snapshot)
+        if not found:
+            raise
+        count("snapshot.fallback")
+        return found
+
+
+def _get_remote(endpoint: str, params: dict, retries: int = 0) -> dict:
+    """
+    This function sends a request to the shared server started with `server.py`.
+
+    Args:
+        endpoint: Name of the endpoint, either "search" or "offers".
+        params: Query parameters of the request.
+        retries: Number of times the request is retried if it fails transiently, e.g. when
+            the server rate limits this client.
+
+    Returns:
+        The JSON body of the response.
+
+    Raises:
+        httpx.HTTPError: If the request fails or the response has an error status.
+        CircuitOpenError: If requests are paused after repeated failures.
+    """
+    count(f"requests.server.{endpoint}")
+    with span(f"network.server.{endpoint}"):
+        url = f"{SERVER_URL.rstrip('/')}/{endpoint}"
+        return _send("GET", url, retries, params=params)
+
+
+def movie_to_dict(movie) -> dict:
+    """
+    This function converts a movie returned by `find_titles` to a JSON serializable
+    dictionary.
+
+    Args:
+        movie (MediaEntry): The movie.
+
+    Returns:
+        A dictionary with the fields of the movie, its offers and their packages.
+    """
+    return {
+        **movie._asdict(),
+        "offers": [
+            {**offer._asdict(), "package": offer.package._asdict()}
+            for offer in movie.offers
+        ],
+    }
+
+
+def movie_from_dict(data: dict):
+    """
+    This function converts a dictionary returned by `movie_to_dict` back to a movie.
+
+    Args:
+        data: The dictionary.
+
+    Returns:
+        MediaEntry: The movie.
+    """
+    from simplejustwatchapi.query import (
+        MediaEntry,
+        Offer as JustWatchOffer,
+        OfferPackage,
+    )
+
+    offers = [
+        JustWatchOffer(**{**offer, "package": OfferPackage(**offer["package"])})
+        for offer in data["offers"]
+    ]
+    return MediaEntry(**{**data, "offers": offers})
+
+
+def _single_flight(key: tuple, fetch):
+    """
+    This function coalesces identical requests. The first caller for a key runs `fetch`,
+    while the callers arriving before it completes wait for it and share its result, or
+    the error it raised, instead of sending the same request again.
+
+    Args:
+        key: Identifier of the request, starting with its kind (e.g. "search").
+        fetch: Function without arguments that sends the request.
+
+    Returns:
+        The value returned by `fetch`.
+    """
+    with _IN_FLIGHT_LOCK:
+        future = _IN_FLIGHT.get(key)
+        leader = future is None
+        if leader:
+            future = _IN_FLIGHT[key] = Future()
+    if not leader:
+        count(f"coalesced.{key[0]}")
+        return future.result()
+    try:
+        value = fetch()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(value)
+        return value
+    finally:
+        with _IN_FLIGHT_LOCK:
+            del _IN_FLIGHT[key]
+
+
+def _cached_fetch(namespace: str, key: str, ttl: float, fetch, on_refresh):
+    """
+    This function returns a raw JustWatch response from the disk cache, falling back to
+    the network when it is missing. Stale entries are returned as they are while a
+    background thread fetches a fresh copy.
+
+    Args:
+        namespace: Namespace of the entry in the disk cache.
+        key: Key of the entry in the disk cache.
+        ttl: Number of seconds after which the stored response becomes stale.
+        fetch: Function without arguments that retrieves the response from JustWatch.
+        on_refresh: Function without arguments called after a background refresh.
+
+    Returns:
+        The raw response returned by `fetch`.
+    """
+    value, stale = DISK_CACHE.get(namespace, key)
+    count(
+        f"disk.{namespace}."
+        + ("miss" if value is None else "stale" if stale else "hit")
+    )
+    if value is None:
+        value = fetch()
+        if not isinstance(value, PartialOffers):
+            DISK_CACHE.set(namespace, key, value, ttl)
+    elif stale:
+        _schedule_refresh(namespace, key, ttl, fetch, on_refresh)
+    return value
+
+
+def _schedule_refresh(namespace: str, key: str, ttl: float, fetch, on_refresh):
+    """
+    This function starts a background thread refreshing a stale disk cache entry, unless
+    one is already running for the same entry.
+
+    Args:
+        namespace: Namespace of the entry in the disk cache.
+        key: Key of the entry in the disk cache.
+        ttl: Number of seconds after which the stored response becomes stale.
+        fetch: Function without arguments that retrieves the response from JustWatch.
+        on_refresh: Function without arguments called once the entry has been updated.
+    """
+    with _REFRESHING_LOCK:
+        if (namespace, key) in _REFRESHING:
+            return
+        _REFRESHING.add((namespace, key))
+    threading.Thread(
+        target=_refresh, args=(namespace, key, ttl, fetch, on_refresh), daemon=True
+    ).start()
+
+
+def _refresh(namespace: str, key: str, ttl: float, fetch, on_refresh):
+    """
+    This function fetches a fresh copy of a stale disk cache entry.
+
+    Args:
+        namespace: Namespace of the entry in the disk cache.
+        key: Key of the entry in the disk cache.
+        ttl: Number of seconds after which the stored response becomes stale.
+        fetch: Function without arguments that retrieves the response from JustWatch.
+        on_refresh: Function without arguments called once the entry has been updated.
+    """
+    try:
+        value = fetch()
+        if not isinstance(value, PartialOffers):
+            DISK_CACHE.set(namespace, key, value, ttl)
+            on_refresh()
+    except Exception:
+        # The stale copy stays in place and the refresh is retried on the next access.
+        pass
+    finally:
+        with _REFRESHING_LOCK:
+            _REFRESHING.discard((namespace, key))
 
 
 def complete_dict(dictionary: dict) -> dict:
     """
     This function processes a dictionary to remove duplicate information
-    and include all streaming services for each movie and region.
+    and include all streaming services for each movie and region. The offers matrix
+    returned by `find_offers` is built directly by `group_offers` instead.
 
     Args:
         dictionary: A dictionary containing movie information.
@@ -72,12 +1264,67 @@ def complete_dict(dictionary: dict) -> dict:
     Returns:
         A processed dictionary.
     """
-    all_services = set.union(set(INCLUDED_SERVICES.keys()), DUPLICATED_SERVICE)
     for k, v in dictionary.items():
-        dictionary[k] = {key: v[key] if key in v else None for key in all_services}
+        dictionary[k] = {key: v[key] if key in v else None for key in _ALL_SERVICES}
         dictionary[k]["Amazon Video"] = (
             dictionary[k]["Amazon Video"] or dictionary[k]["Amazon Prime Video"]
         )
         del dictionary[k]["Amazon Prime Video"]
         dictionary[k] = {INCLUDED_SERVICES[k]: v for k, v in dictionary[k].items()}
     return dictionary
+
+
+def offers_as_dict(offers: dict) -> dict:
+    """
+    This function converts the offers matrix returned by `find_offers` to nested
+    dictionaries, with the shape produced by `complete_dict`, e.g. to serialize them.
+
+    Args:
+        offers: A dictionary with the structure returned by `find_offers`.
+
+    Returns:
+        A dictionary mapping each country to a dictionary mapping each service of
+        `ORDERED_SERVICES` to the URL and price of its offer, or None.
+    """
+    return {
+        country: {
+            service: offer and offer.to_dict()
+            for service, offer in zip(ORDERED_SERVICES, row)
+        }
+        for country, row in offers.items()
+    }
+
+
+def offers_from_dict(offers: dict) -> dict:
+    """
+    This function converts a dictionary returned by `offers_as_dict` back to an offers
+    matrix.
+
+    Args:
+        offers: A dictionary with the structure returned by `offers_as_dict`.
+
+    Returns:
+        A dictionary with the structure returned by `find_offers`.
+    """
+    return {
+        country: tuple(
+            Offer(**services[service]) if services.get(service) else None
+            for service in ORDERED_SERVICES
+        )
+        for country, services in offers.items()
+    }
+
+
+def cache_stats() -> dict:
+    """
+    This function reports how the in-process caches are being used.
+
+    Returns:
+        A dictionary with the hits, misses and size of the search and offers caches, and
+        the concurrency limit of the requests sent upstream.
+    """
+    return {
+        "search": SEARCH_CACHE.stats(),
+        "offers": OFFERS_CACHE.stats(),
+        "upstream": _LIMITER.stats(),
+    }
@@ -0,0 +1,187 @@
+"""
+This module provides lightweight timing spans and counters for the hot paths of the app.
+
+Instrumentation is enabled by setting the `WATCH_MOVIES_TRACE` environment variable, which
+can also be defined in a `.env` file, to the path of a JSON lines file, or to "1" to write
+`trace.jsonl` in the user cache directory. Every span is written as a line when it ends,
+while counters are written when the application exits. When disabled, spans and counters
+are no-ops.
+
+Includes functions:
+  - configure(path: str | None):
+      Enables instrumentation writing to the given file, or disables it.
+  - span(name: str, **fields):
+      Returns a context manager timing the code it wraps.
+  - count(name: str, value: int = 1):
+      Increments a counter.
+  - flush():
+      Writes the current value of the counters.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from dotenv import load_dotenv
+
+from storage import user_cache_dir
+
+ENABLED = False
+_file = None
+_lock = threading.Lock()
+_counters = defaultdict(int)
+
+
+class _Span:
+    """
+    This class times the code of a `with` block and writes it as a JSON line.
+    """
+
+    __slots__ = ("name", "fields", "start")
+
+    def __init__(self, name: str, fields: dict):
+        self.name = name
+        self.fields = fields
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = (time.perf_counter() - self.start) * 1000
+        record = {
+            "type": "span",
+            "name": self.name,
+            "ms": round(duration, 3),
+            "ts": round(time.time(), 3),
+            "thread": threading.current_thread().name,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(self.fields)
+        _write(record)
+        return False
+
+    def set(self, **fields):
+        """
+        Adds fields to the span, e.g. the size of a payload known only at its end.
+        """
+        self.fields.update(fields)
+
+
+class _NoopSpan:
+    """
+    This class is returned by `span` while instrumentation is disabled.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def configure(path: str | None):
+    """
+    This function enables instrumentation, or disables it if no path is given or the file
+    cannot be opened.
+
+    Args:
+        path: Location of the JSON lines file the spans and counters are appended to.
+    """
+    global ENABLED, _file
+    with _lock:
+        if _file is not None:
+            _file.close()
+            _file = None
+        ENABLED = False
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            _file = open(path, "a", encoding="utf-8", buffering=1)
+        except OSError:
+            return
+        ENABLED = True
+
+
+def span(name: str, **fields):
+    """
+    This function returns a context manager timing the code it wraps.
+
+    Args:
+        name: Name of the stage, e.g. "network.search" or "render.offers_page".
+        **fields: Additional values written with the span.
+
+    Returns:
+        A context manager whose `set` method adds fields to the span.
+    """
+    if not ENABLED:
+        return _NOOP_SPAN
+    return _Span(name, fields)
+
+
+def count(name: str, value: int = 1):
+    """
+    This function increments a counter, e.g. cache hits, requests or payload sizes.
+
+    Args:
+        name: Name of the counter.
+        value: Amount added to the counter.
+    """
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] += value
+
+
+def flush():
+    """
+    This function writes the current value of the counters.
+    """
+    if not ENABLED:
+        return
+    with _lock:
+        counters = dict(_counters)
+    _write({"type": "counters", "ts": round(time.time(), 3), **counters})
+
+
+def _write(record: dict):
+    """
+    This function appends a record to the instrumentation file.
+
+    Args:
+        record: The JSON serializable record.
+    """
+    with _lock:
+        if _file is not None:
+            _file.write(json.dumps(record, default=str) + "\n")
+
+
+def _configure_from_env():
+    """
+    This function enables instrumentation if `WATCH_MOVIES_TRACE` is set.
+    """
+    load_dotenv()
+    value = os.environ.get("WATCH_MOVIES_TRACE", "")
+    if value.lower() in ("", "0", "false"):
+        return
+    if value.lower() in ("1", "true"):
+        value = os.path.join(user_cache_dir(), "trace.jsonl")
+    configure(value)
+
+
+_configure_from_env()
+atexit.register(flush)
@@ -2,16 +2,63 @@
 This module defines the App class, which serves as the core logic for a movie streaming 
 application built with Flet.
 
-It interacts with helper functions (`find_offers` and `find_titles`) to retrieve movie 
+It interacts with helper functions (`iter_offers` and `find_titles`) to retrieve movie 
 data and streaming offers, and utilizes constants (`ORDERED_SERVICES` and `GENRE_MAPPING`) 
 to manage service names and genre translations.
+
+Run it with `--startup-time` to print the time taken by the search window to appear, from
+the start of this module, and exit.
 """
 
-import webbrowser
+import time
+
+STARTED = time.perf_counter()
+
+import atexit
+import bisect
+import os
+import sys
+import threading
 from components import composite_text, text_field
 from style import COLORS
-from constants import ORDERED_SERVICES, GENRE_MAPPING
-from helpers import find_offers, find_titles
+from constants import (
+    ALL_COUNTRIES,
+    ORDERED_SERVICES,
+    GENRE_MAPPING,
+    OFFERS_PAGE_SIZE,
+    CARDS_BATCH_SIZE,
+    CARDS_SCROLL_THRESHOLD,
+    POSTER_HEIGHT,
+    POSTER_CACHE_SIZE,
+    PREFETCH_TOP_K,
+    PREFETCH_WORKERS,
+    PREFETCH_BUDGET,
+    PREFETCH_WINDOW,
+    SEARCH_DEBOUNCE,
+    SEARCH_MIN_CHARS,
+    TITLE_INDEX_SIZE,
+    TITLE_SUGGESTIONS,
+    WATCHLIST_INTERVAL,
+    WATCHLIST_BUDGET,
+    WATCHLIST_WINDOW,
+    WATCHLIST_MIN_AGE,
+)
+from instrumentation import span
+from helpers import (
+    OFFLINE,
+    find_titles,
+    find_titles_by_prefix,
+    find_titles_multi,
+    iter_offers,
+    resolve_countries,
+    resolve_locales,
+)
+from posters import PosterCache
+from prefetch import OffersPrefetcher
+from storage import user_cache_dir
+from tasks import LatestTaskRunner
+from titles import TitleIndex
+from watchlist import Watchlist, WatchlistRefresher, describe_changes
 import flet as ft
 
 
@@ -26,9 +73,64 @@ class App:
         and page references.
         """
         self.movies = []
+        self.cards = {}
+        self.cards_column = ft.Column()
         self.search_bar = {}
+        self.search_timer = None
+        self.search_lock = threading.Lock()
         self.page = None
+        self.movie_id = None
         self.offers = None
+        self.offers_scope = None
+        self.offer_countries = []
+        self.offers_table = None
+        self.offers_page_index = 0
+        self.pager = {}
+        self.expand_button = ft.TextButton(
+            "Show all countries",
+            icon=ft.icons.PUBLIC,
+            icon_color=COLORS["yellow"],
+            on_click=self.expand_offers,
+        )
+        self.tasks = LatestTaskRunner()
+        self.prefetcher = OffersPrefetcher(
+            PREFETCH_TOP_K, PREFETCH_WORKERS, PREFETCH_BUDGET, PREFETCH_WINDOW
+        )
+        self.posters = PosterCache(
+            os.path.join(user_cache_dir(), "posters"),
+            POSTER_CACHE_SIZE,
+            POSTER_HEIGHT,
+        )
+        self.progress = ft.ProgressBar(
+            visible=False, color=COLORS["yellow"], bgcolor=COLORS["black"]
+        )
+        self.back_button = ft.IconButton(
+            ft.icons.ARROW_BACK, on_click=self.recreate_main_page, visible=False
+        )
+        self.watchlist = Watchlist(os.path.join(user_cache_dir(), "watchlist.json"))
+        self.refresher = WatchlistRefresher(
+            self.watchlist,
+            self.watchlist_changed,
+            WATCHLIST_INTERVAL,
+            WATCHLIST_BUDGET,
+            WATCHLIST_WINDOW,
+            WATCHLIST_MIN_AGE,
+        )
+        self.watch_button = ft.IconButton(
+            ft.icons.STAR_BORDER,
+            selected_icon=ft.icons.STAR,
+            selected_icon_color=COLORS["yellow"],
+            tooltip="Watch availability",
+            on_click=self.toggle_watchlist,
+            visible=False,
+        )
+        self.titles = TitleIndex(
+            os.path.join(user_cache_dir(), "titles.idx"), TITLE_INDEX_SIZE
+        )
+        self.suggestions = ft.Column(visible=False, spacing=0)
+        self.results_view = ft.Column()
+        self.offers_view = ft.Column(visible=False)
+        self.results_offset = 0
 
     def movie_click(self, e):
         """
@@ -38,12 +140,71 @@ class App:
             e (ft.Event): The click event object.
 
         This function retrieves streaming offers for the movie that was clicked on.
-        It extracts the movie ID from the event object and uses the `find_offers`
-        function (assumed to be imported from a separate module) to retrieve offers.
-        It then calls the `create_offers_page` function to display the offers.
+        It extracts the movie ID from the event object and streams the results of the
+        `iter_offers` function through the background task runner, so that the window
+        stays responsive while the offers are downloaded. Only the countries in the
+        offers scope of the search bar are requested. The offers page is displayed
+        as soon as the first shard of countries arrives, starting from the country typed
+        in the search bar, and `add_offers` fills in the rows of the following ones. Any
+        search or offers request still in progress is superseded, the search scheduled
+        while the user was typing is cancelled, and the offers prefetch stops so that it
+        does not compete with the movie opened.
+        """
+        self.cancel_typing_search()
+        self.prefetcher.cancel()
+        self.movie_id = e.control.key
+        self.watch_button.selected = self.movie_id in self.watchlist
+        self.offers = None
+        self.offers_scope = resolve_countries(
+            self.search_bar["scope"].value or "", self.home_country()
+        )
+        self.stream_offers()
+
+    def expand_offers(self, _):
+        """
+        Handles clicks on the button extending the offers page to every country.
+
+        Args:
+            _: A dummy argument (not used).
+
+        The rows already displayed are kept, while the offers of the remaining countries
+        are streamed in.
+        """
+        self.offers_scope = ALL_COUNTRIES
+        self.expand_button.visible = False
+        self.stream_offers()
+
+    def stream_offers(self):
+        """
+        Streams the offers of the selected movie for the countries in the offers scope.
+        """
+        movie_id, countries, home_country = (
+            self.movie_id,
+            self.offers_scope,
+            self.home_country(),
+        )
+        self.show_progress(True)
+        self.tasks.submit_stream(
+            "page",
+            lambda: iter_offers(movie_id, home_country, countries),
+            self.add_offers,
+            self.finish_offers,
+            self.show_error,
+        )
+
+    def home_country(self):
+        """
+        Returns the country typed in the search bar, or the first country searched in if
+        several are typed, e.g. "IT, FR", or "ANY".
+
+        Returns:
+            str: The 2-letter ISO code of the country in upper case.
         """
-        self.offers = find_offers(e.control.key)
-        self.create_offers_page()
+        country, _ = resolve_locales(
+            self.search_bar["country"].value or "",
+            self.search_bar["language"].value or "",
+        )[0]
+        return country[:2].upper()
 
     def btn_click(self, _):
         """
@@ -54,17 +215,265 @@ class App:
 
         This function retrieves movies based on user-provided search criteria.
         It gets the values from the movie title, country code, and language code
-        input fields in the search bar. It then calls the `find_titles` function
-        (assumed to be imported from a separate module) to search for movies
-        matching the criteria. Finally, it updates the `movies` list with the
-        search results and calls the `create_movie_cards` function to display them.
-        """
-        self.movies = find_titles(
-            self.search_bar["movie_input"].value,
-            self.search_bar["country"].value,
-            self.search_bar["language"].value,
+        input fields in the search bar. It then submits the `find_titles` function
+        to the background task runner to search for movies matching the criteria.
+        When several country or language codes, or "ANY", are typed, the locales are
+        searched concurrently with `find_titles_multi` and their results merged.
+        Once the search completes, `show_movies` updates the `movies` list and
+        displays them. Any search or offers request still in progress is superseded,
+        and the offers prefetch of the previous search is cancelled.
+        """
+        self.cancel_typing_search()
+        self.run_search()
+
+    def run_search(self):
+        """
+        Searches in the background for the title typed in the search bar, as described in
+        `btn_click`, without cancelling the search scheduled while the user is typing.
+        """
+        self.prefetcher.cancel()
+        movie_title = self.search_bar["movie_input"].value or ""
+        country = self.search_bar["country"].value or ""
+        language = self.search_bar["language"].value or ""
+        locales = resolve_locales(country, language)
+        self.show_progress(True)
+        if len(locales) > 1:
+            search, args = find_titles_multi, (movie_title, locales)
+        else:
+            search, args = find_titles, (movie_title, country, language)
+        self.tasks.submit(
+            "page", lambda: search(*args), self.show_movies, self.show_error
         )
+
+    def title_changed(self, e):
+        """
+        Handles changes of the movie title field, searching as the user types.
+
+        Args:
+            e (ft.Event): The change event object.
+
+        Titles seen in previous searches that match the text typed are suggested straight
+        away from the local title index. If a prefix of the title has already been searched,
+        its cached results matching the text typed are displayed straight away, until the
+        search runs once the user has stopped typing for `SEARCH_DEBOUNCE` seconds. Each
+        keystroke cancels the pending search and supersedes the request in flight.
+        Multi-locale searches are not answered from the cache of a prefix.
+        """
+        self.cancel_typing_search()
+        movie_title = e.control.value or ""
+        self.show_suggestions(movie_title)
+        if len(movie_title.strip()) < SEARCH_MIN_CHARS:
+            return
+        country = self.search_bar["country"].value or ""
+        language = self.search_bar["language"].value or ""
+        cached = None
+        if len(resolve_locales(country, language)) == 1:
+            cached = find_titles_by_prefix(movie_title, country, language)
+        if cached is not None:
+            self.tasks.submit(
+                "page", lambda: cached, lambda m: self.show_movies(m, prefetch=False)
+            )
+        with self.search_lock:
+            timer = threading.Timer(
+                SEARCH_DEBOUNCE, lambda: self.typing_search_due(timer)
+            )
+            timer.daemon = True
+            self.search_timer = timer
+        timer.start()
+
+    def typing_search_due(self, timer):
+        """
+        Runs the search scheduled while the user was typing, unless it has been cancelled or
+        replaced by a newer one since the timer fired.
+
+        Args:
+            timer (threading.Timer): The timer that fired.
+        """
+        with self.search_lock:
+            if self.search_timer is not timer:
+                return
+            self.search_timer = None
+        self.run_search()
+
+    def show_suggestions(self, text: str):
+        """
+        Displays below the search bar the titles of the local title index matching the
+        text typed, or hides the suggestions if there is none.
+
+        Args:
+            text (str): The text of the movie title field.
+        """
+        with span("render.suggestions"):
+            found = self.titles.suggest(text, TITLE_SUGGESTIONS)
+            self.suggestions.controls = [
+                ft.TextButton(
+                    title.title
+                    + (f" ({title.release_date[:4]})" if title.release_date else ""),
+                    key=title.entry_id,
+                    data=title.title,
+                    on_click=self.suggestion_click,
+                    style=ft.ButtonStyle(color=COLORS["light_grey"]),
+                )
+                for title in found
+            ]
+            self.suggestions.visible = bool(found)
+        self.update_page()
+
+    def suggestion_click(self, e):
+        """
+        Handles clicks on a suggested title, opening the offers of the movie as
+        `movie_click` does, without searching for it first, so that the offers known to the
+        caches are displayed even offline. The title is copied to the movie title field.
+
+        Args:
+            e (ft.Event): The click event object, whose control key is the identifier of the
+                movie and whose data is its title.
+        """
+        self.search_bar["movie_input"].value = e.control.data
+        self.suggestions.visible = False
+        self.movie_click(e)
+
+    def cancel_typing_search(self):
+        """
+        Cancels the search scheduled while the user is typing, if any.
+        """
+        with self.search_lock:
+            if self.search_timer is not None:
+                self.search_timer.cancel()
+                self.search_timer = None
+
+    def show_movies(self, movies, prefetch=True):
+        """
+        Displays the results of a completed search, and starts prefetching the offers
+        of the first results in the offers scope of the search bar. The results are added
+        to the local title index, and the suggestions are hidden.
+
+        Args:
+            movies (list): The movies returned by `find_titles`.
+            prefetch (bool): Whether to prefetch the offers of the first results.
+        """
+        self.movies = movies
+        self.show_progress(False)
         self.create_movie_cards()
+        if not prefetch:
+            return
+        self.titles.add(movies)
+        if self.suggestions.visible:
+            self.suggestions.visible = False
+            self.update_page()
+        self.prefetcher.start(
+            [movie.entry_id for movie in movies],
+            resolve_countries(
+                self.search_bar["scope"].value or "", self.home_country()
+            ),
+        )
+
+    def add_offers(self, offers):
+        """
+        Adds the offers of a shard of countries to the offers page, creating the page
+        when the first shard arrives. The rows of the current page are rebuilt only if
+        one of the new countries falls in it or before it.
+
+        Args:
+            offers (dict): The offers yielded by `iter_offers`.
+        """
+        if self.offers is None:
+            self.offers = {}
+            self.create_offers_page()
+        first_index = len(self.offer_countries)
+        for country in offers:
+            if country in self.offers:
+                continue
+            index = bisect.bisect(self.offer_countries, country)
+            self.offer_countries.insert(index, country)
+            self.offers[country] = offers[country]
+            first_index = min(first_index, index)
+        if first_index < (self.offers_page_index + 1) * OFFERS_PAGE_SIZE:
+            self.render_offers_rows()
+        else:
+            self._update_pager()
+        self.update_page()
+
+    def finish_offers(self):
+        """
+        Hides the progress bar once every shard of countries has been received, creating
+        an empty offers page if the movie is not available anywhere.
+        """
+        if self.offers is None:
+            self.offers = {}
+            self.create_offers_page()
+        self.show_progress(False)
+
+    def toggle_watchlist(self, _):
+        """
+        Handles clicks on the star of the application bar, adding the movie displayed to
+        the watchlist, or removing it. The countries of the offers scope are watched, and
+        the availability of the movie is then refreshed in the background. A movie that is
+        no longer among the search results cannot be added, since its details are missing,
+        and the change is undone if the watchlist cannot be saved.
+
+        Args:
+            _: A dummy argument (not used).
+        """
+        if self.movie_id in self.watchlist:
+            saved = self.watchlist.remove(self.movie_id)
+        else:
+            movie = next((m for m in self.movies if m.entry_id == self.movie_id), None)
+            if movie is None:
+                self.show_message("Search for the movie again to watch it")
+                return
+            scope = self.offers_scope
+            saved = self.watchlist.add(movie, None if scope == ALL_COUNTRIES else scope)
+        self.watch_button.selected = self.movie_id in self.watchlist
+        if not saved:
+            self.show_message("Unable to save the watchlist")
+        self.update_page()
+
+    def watchlist_changed(self, entry, changes):
+        """
+        Notifies the user that the offers of a movie in the watchlist changed.
+
+        Args:
+            entry (dict): The watchlist entry of the movie.
+            changes (list): The differences returned by `diff_offers`.
+        """
+        title = entry["movie"]["title"]
+        self.show_message(f"{title}: {describe_changes(changes)}")
+
+    def show_error(self, error):
+        """
+        Notifies the user that a background request failed.
+
+        Args:
+            error (Exception): The exception raised by the request.
+        """
+        self.show_progress(False)
+        self.show_message(f"Unable to reach JustWatch: {error}")
+
+    def show_message(self, message: str):
+        """
+        Shows a message in a snack bar at the bottom of the window.
+
+        Args:
+            message (str): The message.
+        """
+        self.page.snack_bar = ft.SnackBar(
+            ft.Text(message, color=COLORS["white"]),
+            bgcolor=COLORS["medium_grey"],
+        )
+        self.page.snack_bar.open = True
+        self.update_page()
+
+    def show_progress(self, visible: bool):
+        """
+        Shows or hides the progress bar below the application bar.
+
+        Args:
+            visible (bool): Whether a background request is in progress.
+        """
+        self.progress.visible = visible
+        if self.progress.page is not None:
+            self.progress.update()
 
     def main(self, page: ft.Page):
         """
@@ -74,8 +483,14 @@ class App:
         page (ft.Page): The Flet page object where the app will be displayed.
 
         This function sets up the initial layout of the application window.
-        It defines the window size, title, and scroll mode. Finally, it calls the
-        `create_search_bar` function to build and display the search bar.
+        It defines the window size, title, and scroll mode. Finally, it adds the
+        application bar, the progress bar and the two views of the application: the
+        search results, built by `create_search_bar`, and the offers page, hidden until
+        a movie is selected. Both views are kept alive while switching between them. The
+        refresh of the watchlist starts in the background, unless the application is
+        offline, and the local title index is loaded in the background.
+        When the application is run with `--startup-time`, the time taken to get there is
+        printed and the window is closed.
         """
         self.page = page
         self.page.window_width = 1450
@@ -84,31 +499,35 @@ class App:
         self.page.window_frameless = True
         self.page.bgcolor = COLORS["black"]
         self.page.scroll = ft.ScrollMode.AUTO
+        self.page.on_scroll = self.page_scrolled
+        self.page.on_scroll_interval = 100
         self.create_app_bar()
         self.create_search_bar()
+        self.results_view.controls.append(self.cards_column)
+        self.page.add(self.progress, self.results_view, self.offers_view)
+        if not OFFLINE:
+            self.refresher.start()
+        self.titles.load_async()
+        atexit.register(self.titles.save)
+        if "--startup-time" in sys.argv:
+            elapsed = (time.perf_counter() - STARTED) * 1000
+            print(f"Search window ready in {elapsed:.0f} ms")
+            self.page.window_close()
 
     def create_app_bar(self):
         """
         Create the application bar or header for the GUI.
 
-        This function constructs an application bar containing a back button (if offers are
-        available), a logo, and a close button. The logo is draggable to allow the user to
-        move the window.
+        This function constructs an application bar containing a back button and a star
+        adding the movie to the watchlist (both visible while the offers page is displayed),
+        a logo, and a close button. The logo is draggable to
+        allow the user to move the window.
         """
-        back_button = (
-            [
-                ft.IconButton(
-                    ft.icons.ARROW_BACK,
-                    on_click=lambda _: self.recreate_main_page(None),
-                )
-            ]
-            if self.offers
-            else []
-        )
         self.page.add(
             ft.Row(
-                back_button
-                + [
+                [
+                    self.back_button,
+                    self.watch_button,
                     ft.WindowDragArea(
                         ft.Container(
                             ft.Image(
@@ -129,22 +548,30 @@ class App:
 
     def create_search_bar(self):
         """
-        Constructs the search bar with movie title, country code, and language code
-        input fields, and a search button.
+        Constructs the search bar with movie title, country code, language code and
+        offers scope input fields, and a search button.
 
         This function creates individual Flet controls for the movie title, country
-        code, and language code input fields with labels using `ft.TextField`.
+        code, language code and offers scope input fields with labels using `ft.TextField`.
+        Typing in the movie title field triggers `title_changed`, which searches as the
+        user types.
+        The country and language codes accept several comma separated codes, paired in
+        order, or "ANY" as the country to search in every locale of `SEARCH_LOCALES`.
+        The offers scope accepts country codes, region presets such as "EU" or "LATAM",
+        "HOME" for the country code typed, or "ALL".
         It creates a search button using `ft.FloatingActionButton` with a search icon
         and assigns the `btn_click` function as the click handler. Finally, it
-        organizes these elements in a row using `ft.Row` and adds them to a container
-        using `ft.Container` with padding and background color. The container
-        is then added to the Flet page using `self.page.add`.
+        organizes these elements in a row using `ft.Row` and adds them, above the
+        suggestions of the local title index, to a container using `ft.Container` with
+        padding and background color. The container is then added to the search results
+        view.
         """
         # Movie Title
         val = self.search_bar.get("movie_input", None)
         val = None if val is None else val.value
         label = "Movie Title"
         self.search_bar["movie_input"] = text_field(label, val, 350)
+        self.search_bar["movie_input"].on_change = self.title_changed
         # Country code
         val = self.search_bar.get("country", None)
         val = "US" if val is None else val.value
@@ -155,6 +582,11 @@ class App:
         val = "en" if val is None else val.value
         label = "Language Code"
         self.search_bar["language"] = text_field(label, val)
+        # Offers scope
+        val = self.search_bar.get("scope", None)
+        val = "ALL" if val is None else val.value
+        label = "Offers In"
+        self.search_bar["scope"] = text_field(label, val)
         # Search Icon
         self.search_bar["icon"] = ft.IconButton(
             icon=ft.icons.SEARCH,
@@ -172,13 +604,20 @@ class App:
             ),
         )
         search_bar = ft.Container(
-            content=ft.Row(
-                self.search_bar.values(), alignment=ft.MainAxisAlignment.CENTER
+            content=ft.Column(
+                [
+                    ft.Row(
+                        self.search_bar.values(),
+                        alignment=ft.MainAxisAlignment.CENTER,
+                    ),
+                    self.suggestions,
+                ],
+                horizontal_alignment=ft.CrossAxisAlignment.CENTER,
             ),
             padding=ft.padding.only(bottom=80, top=20),
             bgcolor=COLORS["black"],
         )
-        self.page.add(search_bar)
+        self.results_view.controls.append(search_bar)
 
     def create_movie_cards(self):
         """
@@ -189,7 +628,8 @@ class App:
         movie poster image and a details container.
 
         The movie poster image section uses a responsive row to adjust the layout for different
-        screen sizes and includes properties like source URL, height, fit mode, and border radius.
+        screen sizes and includes properties like source, height, fit mode, and border radius.
+        Posters are displayed from downscaled thumbnails cached on disk.
 
         The details container uses a column layout to stack details vertically and includes:
         - Movie title with font size and weight adjustments
@@ -199,17 +639,65 @@ class App:
         - A watch button with a play icon, movie ID as key, click handler assigned to the
             `movie_click` function, color, and padding
 
-        After building the card for each movie, it's added to the main column. Finally, it clears
-        any previous controls on the page except one (presumably the search bar), adds the cards
-        column to the page, and updates the page to reflect the changes.
+        Only the first `CARDS_BATCH_SIZE` cards are built straight away: the following ones are
+        added by `render_more_cards` when the user scrolls close to the bottom of the page. Cards
+        built for previous searches are reused when the same movie appears again with the same
+        titles in other locales. Finally, it replaces the cards of the previous search in the
+        results view, and updates the page to reflect the changes.
+        """
+        keys = [self._card_key(movie) for movie in self.movies]
+        self.cards = {key: self.cards[key] for key in keys if key in self.cards}
+        self.cards_column.controls.clear()
+        self.show_view(self.results_view)
+        self.render_more_cards()
+
+    def render_more_cards(self):
+        """
+        This function appends the next batch of movie cards to the search results, if any
+        are left, and updates the page.
+        """
+        start = len(self.cards_column.controls)
+        batch = self.movies[start : start + CARDS_BATCH_SIZE]
+        if not batch and start:
+            return
+        with span("render.cards", cards=len(batch)):
+            for movie in batch:
+                key = self._card_key(movie)
+                if key not in self.cards:
+                    self.cards[key] = self._create_card(movie)
+                self.cards_column.controls.append(self.cards[key])
+        self.update_page()
+
+    def page_scrolled(self, e):
         """
+        Handles scroll events of the page, rendering more movie cards when the user gets
+        close to the bottom of the search results.
+
+        Args:
+            e (ft.OnScrollEvent): The scroll event object.
+        """
+        if not self.results_view.visible:
+            return
+        self.results_offset = e.pixels
+        if e.pixels >= e.max_scroll_extent - CARDS_SCROLL_THRESHOLD:
+            self.render_more_cards()
+
+    def _card_key(self, movie) -> tuple:
+        """
+        This function returns the key a card is reused by: the identifier of the movie, and
+        its titles in the other locales of the search, which the card lists.
+
+        Args:
+            movie (MediaEntry): The movie.
 
-        cards = ft.Column(
-            [self._create_card(movie) for movie in self.movies],
+        Returns:
+            tuple: The identifier of the movie and its other titles, separated by commas.
+        """
+        localized = getattr(self.movies, "titles", {}).get(movie.entry_id, {})
+        other_titles = ", ".join(
+            dict.fromkeys(t for t in localized.values() if t and t != movie.title)
         )
-        self.clear_page_controls(keep=2)
-        self.page.add(cards)
-        self.page.update()
+        return movie.entry_id, other_titles
 
     def _create_card(self, movie):
         """
@@ -220,16 +708,25 @@ class App:
 
         Returns:
             ft.Control: The Flet control representing the movie card.
+
+        The titles of the movie in the other locales of a multi-locale search are listed
+        below its genres. The poster is served from the local thumbnail cache. If it has not
+        been downloaded yet, the card is created with an empty placeholder that `_set_poster`
+        fills in once the thumbnail is ready.
         """
-        image = ft.Image(
-            col=3,
-            src=movie.poster,
-            height=420,
-            fit=ft.ImageFit.FIT_HEIGHT,
-            repeat=ft.ImageRepeat.NO_REPEAT,
-            border_radius=ft.border_radius.all(10),
-        )
+        image = ft.Container(col=3, height=POSTER_HEIGHT)
+        if movie.poster:
+            path = self.posters.get(movie.poster)
+            if path is not None:
+                self._set_poster(image, path)
+            else:
+                self.posters.fetch_async(
+                    movie.poster,
+                    lambda path: self._set_poster(image, path, update=True),
+                    lambda _: self._set_poster(image, movie.poster, update=True),
+                )
         genres = ", ".join(GENRE_MAPPING.get(g, g) for g in movie.genres)
+        _, other_titles = self._card_key(movie)
         column = ft.Column(
             [
                 ft.Container(
@@ -245,6 +742,11 @@ class App:
                 composite_text("Release Date: ", movie.release_date),
                 composite_text("Length: ", movie.runtime_minutes),
                 composite_text("Genres: ", genres),
+                *(
+                    [composite_text("Also Known As: ", other_titles)]
+                    if other_titles
+                    else []
+                ),
                 ft.Container(
                     ft.IconButton(
                         key=movie.entry_id,
@@ -285,24 +787,43 @@ class App:
             shape=ft.RoundedRectangleBorder(radius=0),
         )
 
+    def _set_poster(self, container, src, update=False):
+        """
+        This function displays a poster inside the placeholder of a movie card.
+
+        Args:
+            container (ft.Container): The placeholder of the poster.
+            src (str): The path of the local thumbnail, or the remote URL of the poster.
+            update (bool): Whether the card is already displayed and must be updated.
+        """
+        container.content = ft.Image(
+            src=src,
+            height=POSTER_HEIGHT,
+            fit=ft.ImageFit.FIT_HEIGHT,
+            repeat=ft.ImageRepeat.NO_REPEAT,
+            border_radius=ft.border_radius.all(10),
+        )
+        if update and container.page is not None:
+            container.update()
+
     def create_offers_page(self):
         """
         This function constructs and displays a page with detailed streaming offers for a chosen
-        movie. It starts by clearing all controls from the page to ensure a clean layout for the
-        offer details. Then, it builds an information card using a vertical column layout. This
-        card will contain:
-            - A back button allowing users to return to the main search page. This button uses an
-                icon and assigns the `recreate_main_page` function as the click handler.
+        movie. It starts by replacing the content of the offers view, which is then displayed in
+        place of the search results. Then, it builds an information card using a vertical column
+        layout. The back button returning to the search results is not part of the card: it
+        sits in the application bar, which stays in place. The card will contain:
             - A data table to display streaming offers organized by country and service. The table
                 includes styling options for text, borders, and sorting. It defines columns for
                 country and additional columns for each service name retrieved from
                 `ORDERED_SERVICES`.
 
-        The function iterates through each country with offers in the `self.offers` dictionary:
+        The function iterates through the countries with offers in the `self.offers` dictionary
+        that fall in the current page of the table (see `render_offers_rows`):
             - For each country, it creates a data row in the table.
             - Within the data row, it adds a data cell with the country name.
-            - It loops through each service name in `ORDERED_SERVICES` to check if an offer exists
-                for this country and service in the `self.offers` dictionary.
+            - It loops through the row of the country in the `self.offers` matrix, which holds
+                the offer, if any, of each service in `ORDERED_SERVICES` order.
                 - If an offer exists a data cell is created containing a floating action button.
                     This button displays the service icon and price (if available) or a placeholder
                     if the price is missing. Clicking the button triggers the `open_website`
@@ -310,125 +831,193 @@ class App:
                 - If no offer exists a data cell is created displaying a hyphen (-) to indicate no
                     offer is available.
 
+        The table shows `OFFERS_PAGE_SIZE` countries at a time, so the number of controls sent
+        to the client does not depend on how many countries have offers. Buttons below the
+        table move between pages.
+
         Finally, the information card containing the data table with offer details is added to the
-        page, and the page is updated to reflect the changes.
+        offers view, and the page is updated to reflect the changes. If the offers scope does
+        not include every country, a button to show the offers of all countries is displayed
+        below the table.
         """
-        self.clear_page_controls(0)
-        self.create_app_bar()
-        info_card = ft.DataTable(
-            heading_text_style=ft.TextStyle(
-                weight=ft.FontWeight.W_900, color=COLORS["white"]
-            ),
-            data_text_style=ft.TextStyle(
-                weight=ft.FontWeight.W_400, color=COLORS["white"]
-            ),
-            divider_thickness=0.5,
-            sort_ascending=True,
-            sort_column_index=0,
-            columns=[
-                ft.DataColumn(ft.Text("Country")),
+        with span("render.offers_page", countries=len(self.offers)):
+            self.offer_countries = sorted(self.offers.keys())
+            self.offers_page_index = 0
+            self.offers_table = ft.DataTable(
+                heading_text_style=ft.TextStyle(
+                    weight=ft.FontWeight.W_900, color=COLORS["white"]
+                ),
+                data_text_style=ft.TextStyle(
+                    weight=ft.FontWeight.W_400, color=COLORS["white"]
+                ),
+                divider_thickness=0.5,
+                sort_ascending=True,
+                sort_column_index=0,
+                columns=[
+                    ft.DataColumn(ft.Text("Country")),
+                ]
+                + [ft.DataColumn(ft.Text(service)) for service in ORDERED_SERVICES],
+                vertical_lines=ft.BorderSide(width=2),
+            )
+            self.pager = {
+                "previous": ft.IconButton(
+                    ft.icons.CHEVRON_LEFT,
+                    on_click=lambda _: self.change_offers_page(-1),
+                ),
+                "label": ft.Text(color=COLORS["light_grey"]),
+                "next": ft.IconButton(
+                    ft.icons.CHEVRON_RIGHT,
+                    on_click=lambda _: self.change_offers_page(1),
+                ),
+            }
+            self.render_offers_rows()
+            self.expand_button.visible = self.offers_scope != ALL_COUNTRIES
+            self.offers_view.controls = [
+                self.offers_table,
+                ft.Row(
+                    list(self.pager.values()) + [self.expand_button],
+                    alignment=ft.MainAxisAlignment.CENTER,
+                ),
             ]
-            + [ft.DataColumn(ft.Text(service)) for service in ORDERED_SERVICES],
-            vertical_lines=ft.BorderSide(width=2),
-            rows=[
-                ft.DataRow(
-                    cells=[ft.DataCell(ft.Text(country))]
-                    + [
-                        ft.DataCell(
-                            content=ft.Container(
-                                alignment=ft.alignment.center,
-                                content=(
-                                    ft.IconButton(
-                                        key=self.offers[country][service]["url"],
-                                        content=ft.Row(
-                                            [
-                                                ft.Icon(
-                                                    ft.icons.WEB, color=COLORS["yellow"]
-                                                ),
-                                                ft.Text(
-                                                    "Visit",
-                                                    color=COLORS["yellow"],
-                                                    size=12,
-                                                ),
-                                            ],
-                                            alignment="center",
-                                        ),
-                                        on_click=self.open_website,
-                                        style=ft.ButtonStyle(
-                                            shape={
-                                                ft.MaterialState.DEFAULT: ft.RoundedRectangleBorder(
-                                                    radius=0
-                                                ),
-                                            },
-                                            bgcolor=COLORS["medium_grey"],
-                                        ),
-                                        width=110,
-                                    )
-                                    if self.offers[country][service]
-                                    and self.offers[country][service]["price"] is None
-                                    else (
-                                        ft.IconButton(
-                                            padding=0,
-                                            key=self.offers[country][service]["url"],
-                                            content=ft.Text(
-                                                self.offers[country][service]["price"],
-                                                size=12,
-                                                color=COLORS["cyan"],
-                                            ),
-                                            on_click=self.open_website,
-                                            style=ft.ButtonStyle(
-                                                shape={
-                                                    ft.MaterialState.DEFAULT: ft.RoundedRectangleBorder(
-                                                        radius=0
-                                                    ),
-                                                },
-                                                bgcolor=COLORS["medium_grey"],
-                                            ),
-                                            width=110,
-                                        )
-                                        if self.offers[country][service]
-                                        else ft.Text("-")
-                                    )
-                                ),
-                            )
-                        )
-                        for service in ORDERED_SERVICES
+        self.show_view(self.offers_view)
+        self.update_page()
+        self.page.scroll_to(offset=0, duration=0)
+
+    def _create_offer_row(self, country):
+        """
+        This function creates the data row displaying the offers of a single country.
+
+        Args:
+            country (str): The 2-letter ISO code of the country.
+
+        Returns:
+            ft.DataRow: The Flet control representing the row of the offers table.
+        """
+        return ft.DataRow(
+            cells=[ft.DataCell(ft.Text(country))]
+            + [self._create_offer_cell(offer) for offer in self.offers[country]],
+        )
+
+    def _create_offer_cell(self, offer):
+        """
+        This function creates the data cell displaying a single offer. Missing offers are
+        rendered as a plain hyphen, without any wrapping control.
+
+        Args:
+            offer (Offer | None): The URL and price of the offer, if available.
+
+        Returns:
+            ft.DataCell: The Flet control representing the cell of the offers table.
+        """
+        if not offer:
+            return ft.DataCell(ft.Text("-"))
+        style = ft.ButtonStyle(
+            shape={
+                ft.MaterialState.DEFAULT: ft.RoundedRectangleBorder(radius=0),
+            },
+            bgcolor=COLORS["medium_grey"],
+        )
+        if offer.price is None:
+            button = ft.IconButton(
+                key=offer.url,
+                content=ft.Row(
+                    [
+                        ft.Icon(ft.icons.WEB, color=COLORS["yellow"]),
+                        ft.Text("Visit", color=COLORS["yellow"], size=12),
                     ],
-                )
-                for country in sorted(self.offers.keys())
-            ],
+                    alignment="center",
+                ),
+                on_click=self.open_website,
+                style=style,
+                width=110,
+            )
+        else:
+            button = ft.IconButton(
+                padding=0,
+                key=offer.url,
+                content=ft.Text(offer.price, size=12, color=COLORS["cyan"]),
+                on_click=self.open_website,
+                style=style,
+                width=110,
+            )
+        return ft.DataCell(
+            content=ft.Container(alignment=ft.alignment.center, content=button)
+        )
+
+    def render_offers_rows(self):
+        """
+        This function materializes the rows of the current page of the offers table only,
+        together with the pagination controls below it. Rows of the other pages are built
+        when the user navigates to them.
+        """
+        start = self.offers_page_index * OFFERS_PAGE_SIZE
+        countries = self.offer_countries[start : start + OFFERS_PAGE_SIZE]
+        with span("render.offer_rows", rows=len(countries)):
+            self.offers_table.rows = [self._create_offer_row(c) for c in countries]
+        self._update_pager()
+
+    def _update_pager(self):
+        """
+        Updates the label and buttons used to navigate the pages of the offers table.
+        """
+        start = self.offers_page_index * OFFERS_PAGE_SIZE
+        end = min(start + OFFERS_PAGE_SIZE, len(self.offer_countries))
+        self.pager["label"].value = (
+            f"{start + 1}-{end} of {len(self.offer_countries)}" if end else "No offers"
         )
-        self.page.add(info_card)
-        self.page.update()
+        self.pager["previous"].disabled = self.offers_page_index == 0
+        self.pager["next"].disabled = end >= len(self.offer_countries)
+
+    def change_offers_page(self, step):
+        """
+        Shows the previous or next page of the offers table.
+
+        Args:
+            step (int): -1 to show the previous page, 1 to show the next one.
+        """
+        self.offers_page_index += step
+        self.render_offers_rows()
+        self.update_page()
 
     def recreate_main_page(self, _):
         """
-        This function clears the current page and rebuilds the main search interface.
+        This function switches back from the offers page to the main search interface.
 
-        It's likely used when the user navigates back from the offer details page to the
+        It's used when the user navigates back from the offer details page to the
         movie search page.
 
-        - Clears any existing controls on the page using `clear_page_controls()`.
-        - Calls functions to potentially rebuild search bar elements and movie card displays.
-        - Updates the page to reflect the changes.
+        - Cancels any background request still in progress.
+        - Hides the offers view and shows the search results view, whose controls were
+            kept alive, so nothing has to be rebuilt or sent again to the client.
+        - Restores the scroll position the results had before opening the offers.
         """
+        self.tasks.cancel("page")
+        self.progress.visible = False
         self.offers = None
-        self.clear_page_controls(0)
-        self.create_app_bar()
-        self.create_search_bar()
-        self.create_movie_cards()
+        self.offers_view.controls.clear()
+        self.show_view(self.results_view)
+        self.update_page()
+        self.page.scroll_to(offset=self.results_offset, duration=0)
 
-    def clear_page_controls(self, keep=0):
+    def show_view(self, view):
         """
-        This function removes all controls from the current page except for a specified
-        number (optional).
+        This function displays one of the views of the application and hides the other.
 
         Args:
-            keep (int, optional): The number of controls to retain on the page. Defaults to
-                0 (remove all).
+            view (ft.Column): Either the search results view or the offers view.
         """
-        while len(self.page.controls) > keep:
-            self.page.controls.pop()
+        self.results_view.visible = view is self.results_view
+        self.offers_view.visible = view is self.offers_view
+        self.back_button.visible = view is self.offers_view
+        self.watch_button.visible = view is self.offers_view
+
+    def update_page(self):
+        """
+        This function sends the pending changes of the controls to the client, timing the
+        update when instrumentation is enabled.
+        """
+        with span("page.update"):
+            self.page.update()
 
     def open_website(self, e):
         """
@@ -441,8 +1030,11 @@ class App:
         - Opens the URL in the user's default web browser using a platform-specific library
             (likely imported from a separate module).
         """
+        import webbrowser
+
         webbrowser.open(e.control.key)
 
 
-app = App()
-ft.app(app.main, assets_dir="assets")
+if __name__ == "__main__":
+    app = App()
+    ft.app(app.main, assets_dir="assets")
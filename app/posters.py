@@ -0,0 +1,191 @@
+"""
+This module provides a local cache of movie posters.
+
+Each poster is downloaded once, downscaled with Pillow to the height of the movie cards and
+stored as a JPEG thumbnail under the user cache directory. Thumbnails are evicted in least
+recently used order once their total size exceeds a byte budget. If the directory cannot be
+created or written to, posters are served from their remote URL instead.
+
+Includes classes:
+  - PosterCache: Downloads, downscales and serves movie posters from disk.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PosterCache:
+    """
+    This class stores downscaled movie posters in a directory. The modification time of
+    each file is refreshed when it is used, and is used to evict the least recently used
+    thumbnails.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, height: int, workers: int = 4):
+        """
+        Initializes the cache, creating its directory if needed. The cache is disabled if
+        the directory cannot be created.
+
+        Args:
+            directory: Folder where the thumbnails are stored.
+            max_bytes: Maximum total size of the thumbnails in bytes.
+            height: Height in pixels the posters are downscaled to.
+            workers: Maximum number of posters downloaded at the same time.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.height = height
+        self._lock = threading.Lock()
+        self._sizes = None
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="posters")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self.enabled = True
+        except OSError:
+            self.enabled = False
+
+    def path(self, url: str) -> str:
+        """
+        Returns the location of the thumbnail of a poster.
+
+        Args:
+            url: Remote URL of the poster.
+
+        Returns:
+            The path of the thumbnail, which may not exist yet.
+        """
+        name = hashlib.sha1(url.encode()).hexdigest() + ".jpg"
+        return os.path.join(self.directory, name)
+
+    def get(self, url: str) -> str | None:
+        """
+        Returns the thumbnail of a poster if it has already been downloaded.
+
+        Args:
+            url: Remote URL of the poster.
+
+        Returns:
+            The path of the thumbnail, or None if it is not cached.
+        """
+        if not self.enabled:
+            return None
+        path = self.path(url)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def fetch(self, url: str) -> str:
+        """
+        Returns the thumbnail of a poster, downloading and downscaling it if needed.
+
+        Args:
+            url: Remote URL of the poster.
+
+        Returns:
+            The path of the thumbnail, or the remote URL if the cache is disabled or the
+            thumbnail cannot be stored.
+        """
+        if not self.enabled:
+            return url
+        path = self.get(url)
+        if path is not None:
+            return path
+        import urllib.request
+
+        from PIL import Image
+
+        with urllib.request.urlopen(url, timeout=10) as response:
+            data = response.read()
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+        image.thumbnail((self.height * 2, self.height))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=85, optimize=True)
+        path = self.path(url)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                file.write(buffer.getvalue())
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return url
+        self._add(path, buffer.tell())
+        return path
+
+    def fetch_async(self, url: str, on_done, on_error=None):
+        """
+        Retrieves the thumbnail of a poster in a background thread.
+
+        Args:
+            url: Remote URL of the poster.
+            on_done: Function called with the path of the thumbnail.
+            on_error: Function called with the exception raised, if any (optional).
+        """
+
+        def run():
+            try:
+                path = self.fetch(url)
+            except Exception as e:
+                if on_error is not None:
+                    on_error(e)
+                return
+            on_done(path)
+
+        self._executor.submit(run)
+
+    def _add(self, path: str, size: int):
+        """
+        Records a new thumbnail and evicts the least recently used ones above the budget.
+
+        Args:
+            path: Location of the new thumbnail.
+            size: Size of the new thumbnail in bytes.
+        """
+        with self._lock:
+            if self._sizes is None:
+                try:
+                    self._sizes = {
+                        entry.path: entry.stat().st_size
+                        for entry in os.scandir(self.directory)
+                        if entry.name.endswith(".jpg")
+                    }
+                except OSError:
+                    self._sizes = {}
+            self._sizes[path] = size
+            total = sum(self._sizes.values())
+            if total <= self.max_bytes:
+                return
+            for old_path in sorted(self._sizes, key=_last_used):
+                if total <= self.max_bytes:
+                    break
+                if old_path == path:
+                    continue
+                total -= self._sizes.pop(old_path)
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+
+def _last_used(path: str) -> float:
+    """
+    Returns the last time a thumbnail was used.
+
+    Args:
+        path: Location of the thumbnail.
+
+    Returns:
+        The modification time of the file, or 0 if it no longer exists.
+    """
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
@@ -0,0 +1,102 @@
+"""
+Module for speculatively fetching the offers of the movies a user is likely to open.
+
+Includes classes:
+  - OffersPrefetcher: Warms the offers cache for the top results of a search.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from helpers import find_offers
+
+
+class OffersPrefetcher:
+    """
+    This class fetches in the background the offers of the first results of a search, so
+    that they are already cached when the user opens one of them. Prefetching runs on a
+    bounded worker pool, is limited by a budget of titles per time window, and is cancelled
+    as soon as a new search starts or a movie is opened.
+    """
+
+    def __init__(self, top_k: int, workers: int, budget: int, window: float):
+        """
+        Initializes the prefetcher.
+
+        Args:
+            top_k: Number of search results whose offers are prefetched.
+            workers: Maximum number of titles prefetched at the same time.
+            budget: Maximum number of titles prefetched within `window` seconds.
+            window: Length in seconds of the budget window.
+        """
+        self.top_k = top_k
+        self.budget = budget
+        self.window = window
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._futures = []
+        self._started = deque()
+
+    def start(self, movie_ids: list, countries: set | None = None):
+        """
+        Cancels any previous prefetch and starts fetching the offers of the given movies.
+
+        Args:
+            movie_ids: Unique identifiers of the search results, best match first.
+            countries: 2-letter ISO codes of the countries to search offers in. By default,
+                every country is searched.
+        """
+        with self._lock:
+            generation = self._cancel()
+            self._futures = [
+                self._executor.submit(self._prefetch, generation, movie_id, countries)
+                for movie_id in movie_ids[: self.top_k]
+            ]
+
+    def cancel(self):
+        """
+        Cancels the prefetch in progress. Titles already being fetched are completed, while
+        the pending ones are dropped.
+        """
+        with self._lock:
+            self._cancel()
+
+    def _cancel(self) -> int:
+        """
+        Invalidates the current prefetch. Must be called holding the lock.
+
+        Returns:
+            int: The generation of the next prefetch.
+        """
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+        self._generation += 1
+        return self._generation
+
+    def _prefetch(self, generation: int, movie_id: str, countries: set | None):
+        """
+        Fetches the offers of a movie unless the prefetch has been cancelled or the budget
+        is exhausted. Errors are ignored, since the offers are fetched again on click.
+
+        Args:
+            generation: Generation of the prefetch the title belongs to.
+            movie_id: Unique identifier of the movie.
+            countries: 2-letter ISO codes of the countries to search offers in.
+        """
+        with self._lock:
+            if generation != self._generation:
+                return
+            now = time.monotonic()
+            while self._started and self._started[0] < now - self.window:
+                self._started.popleft()
+            if len(self._started) >= self.budget:
+                return
+            self._started.append(now)
+        try:
+            find_offers(movie_id, countries)
+        except Exception:
+            pass
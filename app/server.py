@@ -0,0 +1,218 @@
+"""
+This module provides a server sharing a single cache of JustWatch responses between the
+instances of the application running on a local network.
+
+The server exposes `find_titles` and `find_offers` as a small HTTP/JSON API. Every response
+goes through the memory and disk caches of `helpers`, and identical requests in flight are
+coalesced, so that N clients cost roughly one upstream request per title. Offers are always
+fetched for every country and restricted afterwards, so that clients with different offers
+scopes share the same entry. Each client is rate limited by its address.
+
+Endpoints:
+  - GET /search?title=...&country=US&language=en: {"movies": [...]}, each movie as returned
+    by `movie_to_dict`.
+  - GET /offers?id=...&countries=US,IT: {"offers": {...}, "failed": [...]}, the offers as
+    returned by `offers_as_dict` and the countries whose offers could not be retrieved.
+    Every country is returned if `countries` is missing.
+  - GET /stats: the statistics of the caches returned by `cache_stats`.
+
+Clients use the server when the `WATCH_MOVIES_SERVER` environment variable is set to its
+address, e.g. "http://192.168.1.10:8765".
+
+Usage:
+    python server.py [--host 0.0.0.0] [--port 8765] [--rate 5] [--burst 20]
+
+Includes classes:
+  - RateLimiter: Token buckets limiting the request rate of each client.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import helpers
+from constants import ALL_COUNTRIES, SERVER_BURST, SERVER_PORT, SERVER_RATE
+
+
+class RateLimiter:
+    """
+    This class keeps a token bucket per client. Buckets are refilled at `rate` tokens per
+    second up to `burst` tokens, and every request takes one token.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Initializes the limiter without any client.
+
+        Args:
+            rate: Number of requests per second allowed on average.
+            burst: Maximum number of requests allowed at once.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def acquire(self, client: str) -> float:
+        """
+        Takes a token from the bucket of a client, if available.
+
+        Args:
+            client: Identifier of the client, e.g. its address.
+
+        Returns:
+            0 if the request is allowed, otherwise the number of seconds until it would be.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[client] = (tokens, now)
+                return (1 - tokens) / self.rate
+            self._buckets[client] = (tokens - 1, now)
+            if len(self._buckets) > 1024:
+                self._prune(now)
+            return 0
+
+    def _prune(self, now: float):
+        """
+        Forgets the clients whose bucket is full again. Must be called holding the lock.
+
+        Args:
+            now: The current time, as returned by `time.monotonic`.
+        """
+        for client, (tokens, last) in list(self._buckets.items()):
+            if tokens + (now - last) * self.rate >= self.burst:
+                del self._buckets[client]
+
+
+def search(params: dict) -> dict:
+    """
+    This function answers a request to the search endpoint.
+
+    Args:
+        params: Query parameters of the request.
+
+    Returns:
+        The JSON body of the response.
+    """
+    movies = helpers.find_titles(
+        params["title"], params.get("country", "US"), params.get("language", "en")
+    )
+    return {"movies": [helpers.movie_to_dict(movie) for movie in movies]}
+
+
+def offers(params: dict) -> dict:
+    """
+    This function answers a request to the offers endpoint.
+
+    Args:
+        params: Query parameters of the request.
+
+    Returns:
+        The JSON body of the response.
+    """
+    found = helpers.find_offers(params["id"])
+    countries = ALL_COUNTRIES
+    if params.get("countries"):
+        countries = set(params["countries"].upper().split(","))
+    failed = getattr(found, "failed", set()) & countries
+    found = {k: v for k, v in found.items() if k in countries}
+    return {"offers": helpers.offers_as_dict(found), "failed": sorted(failed)}
+
+
+def stats(_: dict) -> dict:
+    """
+    This function answers a request to the stats endpoint.
+    """
+    return helpers.cache_stats()
+
+
+ENDPOINTS = {"/search": search, "/offers": offers, "/stats": stats}
+# Requests missing one of these parameters are answered with 400.
+REQUIRED = {"/search": ["title"], "/offers": ["id"]}
+
+
+def create_server(host: str, port: int, limiter: RateLimiter) -> ThreadingHTTPServer:
+    """
+    This function creates the HTTP server, without starting it.
+
+    Args:
+        host: Address the server listens on.
+        port: Port the server listens on, or 0 for a free port.
+        limiter: Rate limiter applied to every client.
+
+    Returns:
+        The server, whose `serve_forever` method handles the requests.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            endpoint = ENDPOINTS.get(url.path)
+            if endpoint is None:
+                return self.reply(404, {"error": "Unknown endpoint"})
+            wait = limiter.acquire(self.client_address[0])
+            if wait:
+                headers = {"Retry-After": str(int(wait) + 1)}
+                return self.reply(429, {"error": "Too many requests"}, headers)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            for name in REQUIRED.get(url.path, []):
+                if name not in params:
+                    return self.reply(400, {"error": f"Missing parameter '{name}'"})
+            try:
+                body = endpoint(params)
+            except Exception as e:
+                message = (str(e).splitlines() or [type(e).__name__])[0]
+                return self.reply(502, {"error": message})
+            self.reply(200, body)
+
+        def reply(self, status: int, body: dict, headers: dict | None = None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    """
+    Parses the command line arguments and runs the server until it is interrupted.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--rate", type=float, default=SERVER_RATE)
+    parser.add_argument("--burst", type=int, default=SERVER_BURST)
+    args = parser.parse_args()
+    # The server itself always talks to JustWatch.
+    helpers.SERVER_URL = None
+    server = create_server(args.host, args.port, RateLimiter(args.rate, args.burst))
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+This module provides offline snapshots of the movie catalog.
+
+A snapshot is a single binary file holding, for a selection of movies, their details and
+their offers in every country. It is read memory-mapped: looking up a movie only reads its
+index slots and its own record, so opening a snapshot is instant and does not load it into
+memory. When a snapshot is opened by `helpers`, `find_titles` and `find_offers` are answered
+from it while offline.
+
+File layout (version 1, little-endian):
+  - Header: magic "WMSNAP", version, number of entries and of titles, offsets of the two
+    indexes and offset and length of the metadata.
+  - Records: one zlib-compressed JSON record per movie, with its details as returned by
+    `movie_to_dict` and a row of `[url, price]` pairs (or null) per country.
+  - Metadata: JSON object with the creation time and the services of the offer rows.
+  - Keys: the keys of both indexes, encoded in UTF-8.
+  - Indexes: fixed-size slots `(key offset, key length, record offset, record length)`
+    sorted by key, one by `entry_id` and one by normalized title, which are searched with
+    a binary search.
+
+Usage:
+    python snapshot.py export offline.snap [--titles titles.txt] [--limit 500]
+    python snapshot.py info offline.snap
+
+Includes functions:
+  - write_snapshot(path: str, entries: list, queries: dict | None = None):
+      Writes a snapshot file.
+  - export_cache(path: str, limit: int | None = None) -> int:
+      Writes a snapshot of the movies whose offers are in the disk cache.
+  - export_titles(path: str, titles: list, ...) -> int:
+      Writes a snapshot of the best match of each title.
+
+Includes classes:
+  - Snapshot: A memory-mapped snapshot file.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import BATCH_WORKERS, ORDERED_SERVICES, SEARCH_RESULTS
+from helpers import (
+    DISK_CACHE,
+    Offer,
+    find_offers,
+    find_titles,
+    group_offers,
+    movie_from_dict,
+    movie_to_dict,
+)
+
+MAGIC = b"WMSNAP"
+VERSION = 1
+_HEADER = struct.Struct("<6sHIIQQQI")
+_SLOT = struct.Struct("<QIQI")
+
+
+def normalize_title(title: str) -> str:
+    """
+    This function normalizes a title the same way the search cache does.
+    """
+    return " ".join(title.split()).casefold()
+
+
+def write_snapshot(path: str, entries: list, queries: dict | None = None):
+    """
+    This function writes a snapshot file, replacing it atomically if it exists.
+
+    Args:
+        path: Location of the snapshot file.
+        entries: List of `(movie, offers)` tuples, with a movie returned by `find_titles`
+            and its offers matrix returned by `find_offers`.
+        queries: Dictionary mapping searched titles to the identifiers of the movies they
+            returned, indexed as titles in addition to the titles of the movies (optional).
+    """
+    records, by_id, by_title = [], [], []
+    position = _HEADER.size
+    for movie, offers in entries:
+        data = zlib.compress(
+            json.dumps(
+                {
+                    "movie": movie_to_dict(movie),
+                    "offers": {
+                        country: [offer and [offer.url, offer.price] for offer in row]
+                        for country, row in offers.items()
+                    },
+                },
+                separators=(",", ":"),
+            ).encode()
+        )
+        location = (position, len(data))
+        records.append(data)
+        by_id.append((movie.entry_id, location))
+        by_title.append((normalize_title(movie.title or ""), location))
+        position += len(data)
+    locations = dict(by_id)
+    for query, entry_ids in (queries or {}).items():
+        query = normalize_title(query)
+        by_title += [(query, locations[i]) for i in entry_ids if i in locations]
+    by_title = sorted(set(by_title))
+    by_id.sort()
+    meta = json.dumps({"created": time.time(), "services": ORDERED_SERVICES}).encode()
+    meta_offset = position
+    position += len(meta)
+    keys, slots = [], {"id": [], "title": []}
+    for name, index in (("id", by_id), ("title", by_title)):
+        for key, (offset, length) in index:
+            key = key.encode()
+            slots[name].append(_SLOT.pack(position, len(key), offset, length))
+            keys.append(key)
+            position += len(key)
+    id_index = position
+    title_index = id_index + _SLOT.size * len(by_id)
+    header = _HEADER.pack(
+        MAGIC,
+        VERSION,
+        len(by_id),
+        len(by_title),
+        id_index,
+        title_index,
+        meta_offset,
+        len(meta),
+    )
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        for chunk in [header, *records, meta, *keys, *slots["id"], *slots["title"]]:
+            file.write(chunk)
+    os.replace(temp_path, path)
+
+
+class Snapshot:
+    """
+    This class reads a snapshot file through a read-only memory map. Records are decoded
+    only when they are looked up.
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens a snapshot file.
+
+        Args:
+            path: Location of the snapshot file.
+
+        Raises:
+            ValueError: If the file is not a snapshot or has an unsupported version.
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{path} is not a snapshot")
+        (
+            magic,
+            version,
+            self._entries,
+            self._titles,
+            self._id_index,
+            self._title_index,
+            meta_offset,
+            meta_length,
+        ) = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot")
+        if version != VERSION:
+            raise ValueError(f"{path} has unsupported version {version}")
+        self.meta = json.loads(self._map[meta_offset : meta_offset + meta_length])
+        services = self.meta["services"]
+        self._columns = [
+            services.index(service) if service in services else None
+            for service in ORDERED_SERVICES
+        ]
+
+    def __len__(self) -> int:
+        """
+        Returns the number of movies in the snapshot.
+        """
+        return self._entries
+
+    def close(self):
+        """
+        Closes the memory map of the file.
+        """
+        self._map.close()
+
+    def find_titles(self, title: str) -> list:
+        """
+        Returns the movies whose title, or a title searched when the snapshot was written,
+        matches the given title exactly or starts with it. Exact matches come first.
+
+        Args:
+            title: Partial or full title of the movie.
+
+        Returns:
+            A list of at most `SEARCH_RESULTS` movies.
+        """
+        prefix = normalize_title(title).encode()
+        movies, seen = [], set()
+        index = self._search(self._title_index, self._titles, prefix)
+        while index < self._titles and len(movies) < SEARCH_RESULTS:
+            key, offset, length = self._slot(self._title_index, index)
+            if not key.startswith(prefix):
+                break
+            if offset not in seen:
+                seen.add(offset)
+                exact = key == prefix
+                movies.append((not exact, index, self._record(offset, length)))
+            index += 1
+        return [movie_from_dict(record["movie"]) for *_, record in sorted(movies)]
+
+    def find_offers(self, entry_id: str, countries: set | None = None) -> dict | None:
+        """
+        Returns the offers of a movie.
+
+        Args:
+            entry_id: Unique identifier of the movie.
+            countries: 2-letter ISO codes of the countries to return offers for. By default,
+                every country is returned.
+
+        Returns:
+            A dictionary with the structure returned by `find_offers`, or None if the movie
+            is not in the snapshot.
+        """
+        key = entry_id.encode()
+        index = self._search(self._id_index, self._entries, key)
+        if index == self._entries:
+            return None
+        found, offset, length = self._slot(self._id_index, index)
+        if found != key:
+            return None
+        return {
+            country: tuple(
+                None if c is None or not row[c] else Offer(*row[c])
+                for c in self._columns
+            )
+            for country, row in self._record(offset, length)["offers"].items()
+            if countries is None or country in countries
+        }
+
+    def _slot(self, index_offset: int, position: int) -> tuple:
+        """
+        Reads a slot of an index.
+
+        Args:
+            index_offset: Offset of the index in the file.
+            position: Position of the slot in the index.
+
+        Returns:
+            A tuple `(key, record offset, record length)`.
+        """
+        key_offset, key_length, offset, length = _SLOT.unpack_from(
+            self._map, index_offset + position * _SLOT.size
+        )
+        return self._map[key_offset : key_offset + key_length], offset, length
+
+    def _search(self, index_offset: int, size: int, key: bytes) -> int:
+        """
+        Finds the first slot of an index whose key is not lower than the given key.
+
+        Args:
+            index_offset: Offset of the index in the file.
+            size: Number of slots in the index.
+            key: The key searched, encoded in UTF-8.
+
+        Returns:
+            The position of the slot, or `size` if every key is lower.
+        """
+        low, high = 0, size
+        while low < high:
+            middle = (low + high) // 2
+            if self._slot(index_offset, middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _record(self, offset: int, length: int) -> dict:
+        """
+        Decodes the record of a movie.
+        """
+        return json.loads(zlib.decompress(self._map[offset : offset + length]))
+
+
+def export_cache(path: str, limit: int | None = None) -> int:
+    """
+    This function writes a snapshot of the movies whose offers in every country are in the
+    disk cache, most recently viewed first. The searches in the cache are indexed too.
+
+    Args:
+        path: Location of the snapshot file.
+        limit: Maximum number of movies in the snapshot (optional).
+
+    Returns:
+        int: The number of movies written.
+    """
+    movies, queries = {}, {}
+    for key, results in DISK_CACHE.items("search"):
+        queries[key.split("|")[0]] = [movie.entry_id for movie in results]
+        for movie in results:
+            movies.setdefault(movie.entry_id, movie)
+    entries = []
+    for key, offers in DISK_CACHE.items("offers"):
+        if key in movies:
+            entries.append((movies[key], group_offers(offers)))
+        if len(entries) == limit:
+            break
+    write_snapshot(path, entries, queries)
+    return len(entries)
+
+
+def export_titles(
+    path: str,
+    titles: list,
+    country: str = "US",
+    language: str = "en",
+    workers: int = BATCH_WORKERS,
+) -> int:
+    """
+    This function writes a snapshot of the best match of each title, with its offers in
+    every country. Titles without any match are left out.
+
+    Args:
+        path: Location of the snapshot file.
+        titles: Titles to search for.
+        country: 2-letter ISO code of the country the titles are searched in.
+        language: 2-letter code of the language of the results.
+        workers: Number of titles looked up at the same time.
+
+    Returns:
+        int: The number of movies written.
+    """
+
+    def lookup(title):
+        movies = find_titles(title, country, language)
+        return movies and (movies[0], find_offers(movies[0].entry_id))
+
+    with ThreadPoolExecutor(workers) as executor:
+        found = dict(zip(titles, executor.map(lookup, titles)))
+    entries = {item[0].entry_id: item for item in found.values() if item}
+    queries = {title: [item[0].entry_id] for title, item in found.items() if item}
+    write_snapshot(path, list(entries.values()), queries)
+    return len(entries)
+
+
+def main():
+    """
+    Parses the command line arguments and exports or describes a snapshot.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write a snapshot")
+    export.add_argument("path")
+    export.add_argument("--titles", help="file with one title per line")
+    export.add_argument("--limit", type=int, help="maximum number of cached movies")
+    export.add_argument("--country", default="US")
+    export.add_argument("--language", default="en")
+    info = commands.add_parser("info", help="describe a snapshot")
+    info.add_argument("path")
+    args = parser.parse_args()
+    if args.command == "export":
+        if args.titles:
+            with open(args.titles, encoding="utf-8") as file:
+                titles = [line.strip() for line in file if line.strip()]
+            written = export_titles(args.path, titles, args.country, args.language)
+        else:
+            written = export_cache(args.path, args.limit)
+        print(f"{written} movies written to {args.path}")
+    else:
+        snapshot = Snapshot(args.path)
+        created = time.strftime(
+            "%Y-%m-%d %H:%M", time.localtime(snapshot.meta["created"])
+        )
+        print(f"{len(snapshot)} movies, created on {created}")
+
+
+if __name__ == "__main__":
+    main()
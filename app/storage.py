@@ -0,0 +1,249 @@
+"""
+This module provides a persistent on-disk cache for raw JustWatch responses.
+
+Entries are stored in a SQLite database under the user cache directory, so that they
+survive restarts of the application and can be shared by several running instances.
+
+Includes functions:
+  - user_cache_dir() -> str:
+      Returns the platform specific directory where the application caches data.
+
+Includes classes:
+  - DiskCache: A size-capped SQLite store with per-entry expiry.
+"""
+
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+)
+"""
+
+_UNPICKLE_ERRORS = (
+    pickle.UnpicklingError,
+    AttributeError,
+    ImportError,
+    EOFError,
+    TypeError,
+    ValueError,
+)
+"""
+Errors raised when unpickling a value stored by an older version of the application or of
+its libraries, e.g. a class that was renamed or moved. Such values are treated as misses.
+"""
+
+
+def user_cache_dir() -> str:
+    """
+    This function returns the directory where the application stores its cached data.
+
+    Returns:
+        The path set in the `WATCH_MOVIES_CACHE_DIR` environment variable if any, otherwise
+        the path of the `watch-movies` folder inside the user cache directory of the
+        current platform.
+    """
+    if os.environ.get("WATCH_MOVIES_CACHE_DIR"):
+        return os.environ["WATCH_MOVIES_CACHE_DIR"]
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "watch-movies")
+
+
+class DiskCache:
+    """
+    This class stores pickled values in a SQLite database with an expiry date per entry
+    and a maximum total size. When the size is exceeded, the least recently accessed
+    entries are evicted first.
+
+    The database runs in WAL mode with a busy timeout, so that several application
+    instances can read and write it concurrently. Each thread uses its own connection.
+    Values are unpickled, therefore the database must only be written by this application.
+    If the database cannot be opened, e.g. in a read-only directory, the cache is disabled:
+    every lookup is a miss and nothing is stored.
+    """
+
+    def __init__(self, path: str, max_bytes: int, max_stale: float):
+        """
+        Initializes the cache, creating the database file if needed.
+
+        Args:
+            path: Location of the SQLite database file.
+            max_bytes: Maximum total size of the stored values in bytes.
+            max_stale: Number of seconds an expired entry can still be served as stale
+                before it is discarded.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_stale = max_stale
+        self._local = threading.local()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self._connect() as connection:
+                connection.execute(_SCHEMA)
+            self.enabled = True
+        except (OSError, sqlite3.Error):
+            self.enabled = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the current thread, opening it on first use.
+
+        Returns:
+            sqlite3.Connection: The connection to the cache database.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, namespace: str, key: str) -> tuple:
+        """
+        Returns the value stored for the given key.
+
+        Args:
+            namespace: Group the entry belongs to (e.g. "search" or "offers").
+            key: Key of the entry inside the namespace.
+
+        Returns:
+            A tuple `(value, stale)`. `value` is None if the entry is missing or too old to
+            be served, while `stale` is True if the entry has expired and should be refreshed.
+        """
+        if not self.enabled:
+            return None, False
+        now = time.time()
+        try:
+            with self._connect() as connection:
+                row = connection.execute(
+                    "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                ).fetchone()
+                if row is None:
+                    return None, False
+                if row[1] + self.max_stale < now:
+                    connection.execute(
+                        "DELETE FROM entries WHERE namespace = ? AND key = ?",
+                        (namespace, key),
+                    )
+                    return None, False
+                connection.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, namespace, key),
+                )
+            return pickle.loads(row[0]), row[1] < now
+        except (sqlite3.Error, *_UNPICKLE_ERRORS):
+            return None, False
+
+    def set(self, namespace: str, key: str, value, ttl: float):
+        """
+        Stores a value and evicts the least recently accessed entries if the cache grows
+        above its maximum size.
+
+        Args:
+            namespace: Group the entry belongs to (e.g. "search" or "offers").
+            key: Key of the entry inside the namespace.
+            value: Picklable value to store.
+            ttl: Number of seconds after which the entry becomes stale.
+        """
+        if not self.enabled:
+            return
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            with self._connect() as connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, key, blob, len(blob), now + ttl, now),
+                )
+                self._evict(connection)
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, connection: sqlite3.Connection):
+        """
+        Deletes the least recently accessed entries until the total size fits the budget.
+
+        Args:
+            connection: Connection with an open write transaction.
+        """
+        total = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = connection.execute(
+            "SELECT rowid, size FROM entries ORDER BY accessed_at"
+        ).fetchall()
+        evicted = []
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((rowid,))
+            total -= size
+        connection.executemany("DELETE FROM entries WHERE rowid = ?", evicted)
+
+    def items(self, namespace: str, limit: int | None = None) -> list:
+        """
+        Returns the entries of a namespace that can still be served, most recently
+        accessed first, without updating their access time.
+
+        Args:
+            namespace: Group of the entries (e.g. "search" or "offers").
+            limit: Maximum number of entries returned (optional).
+
+        Returns:
+            A list of `(key, value)` tuples. Entries that cannot be unpickled are skipped.
+        """
+        if not self.enabled:
+            return []
+        try:
+            with self._connect() as connection:
+                rows = connection.execute(
+                    "SELECT key, value FROM entries WHERE namespace = ? AND expires_at > ?"
+                    " ORDER BY accessed_at DESC LIMIT ?",
+                    (
+                        namespace,
+                        time.time() - self.max_stale,
+                        -1 if limit is None else limit,
+                    ),
+                ).fetchall()
+        except sqlite3.Error:
+            return []
+        items = []
+        for key, value in rows:
+            try:
+                items.append((key, pickle.loads(value)))
+            except _UNPICKLE_ERRORS:
+                continue
+        return items
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        if not self.enabled:
+            return
+        try:
+            with self._connect() as connection:
+                connection.execute("DELETE FROM entries")
+        except sqlite3.Error:
+            pass
@@ -0,0 +1,172 @@
+"""
+Module for running blocking work outside of the Flet event handlers.
+
+Includes classes:
+  - LatestTaskRunner: Runs functions and iterators on a worker pool and only delivers the
+      results of the most recent request submitted on each channel.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LatestTaskRunner:
+    """
+    This class runs functions in background threads. Every request belongs to a channel:
+    submitting a new request on a channel cancels the previous one, whose result is dropped
+    even if it has already started. Callbacks are executed one at a time, and a request is
+    only superseded or cancelled between two callbacks, so results can never be painted out
+    of order, nor after their request was superseded.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        """
+        Initializes the worker pool.
+
+        Args:
+            max_workers: Maximum number of functions running at the same time.
+        """
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="watch-movies"
+        )
+        self._lock = threading.Lock()
+        # Reentrant, so that callbacks can submit or cancel requests.
+        self._callback_lock = threading.RLock()
+        self._tokens = {}
+        self._futures = {}
+
+    def submit(self, channel: str, fn, on_done, on_error=None):
+        """
+        Runs a function in the background, superseding the previous request on the channel.
+
+        Args:
+            channel: Name of the channel the request belongs to.
+            fn: Function without arguments to run.
+            on_done: Function called with the result of `fn` if the request is still the
+                latest one of its channel.
+            on_error: Function called with the exception raised by `fn` if the request is
+                still the latest one of its channel (optional).
+        """
+        with self._callback_lock, self._lock:
+            token = self._cancel(channel)
+            future = self._executor.submit(fn)
+            self._futures[channel] = future
+        future.add_done_callback(
+            lambda f: self._deliver(channel, token, f, on_done, on_error)
+        )
+
+    def submit_stream(self, channel: str, items, on_item, on_done=None, on_error=None):
+        """
+        Consumes an iterator in the background, superseding the previous request on the
+        channel. Items are delivered one by one until a newer request is submitted.
+
+        Args:
+            channel: Name of the channel the request belongs to.
+            items: Function without arguments returning the iterator to consume.
+            on_item: Function called with each item while the request is the latest one.
+            on_done: Function called without arguments once the iterator is exhausted
+                (optional).
+            on_error: Function called with the exception raised by the iterator (optional).
+        """
+        with self._callback_lock, self._lock:
+            token = self._cancel(channel)
+            future = self._executor.submit(
+                self._consume, channel, token, items, on_item
+            )
+            self._futures[channel] = future
+        future.add_done_callback(
+            lambda f: self._deliver(
+                channel,
+                token,
+                f,
+                (lambda _: on_done()) if on_done else (lambda _: None),
+                on_error,
+            )
+        )
+
+    def cancel(self, channel: str):
+        """
+        Cancels the pending request of a channel, if any, and drops its result. Waits for
+        the callback being executed, if any, so that none of the request follows.
+
+        Args:
+            channel: Name of the channel to cancel.
+        """
+        with self._callback_lock, self._lock:
+            self._cancel(channel)
+
+    def is_current(self, channel: str, token: int) -> bool:
+        """
+        Checks whether a request is still the latest one submitted on its channel.
+
+        Args:
+            channel: Name of the channel.
+            token: Token of the request.
+
+        Returns:
+            True if no newer request has been submitted or the channel cancelled since.
+        """
+        with self._lock:
+            return self._tokens.get(channel) == token
+
+    def _consume(self, channel: str, token: int, items, on_item):
+        """
+        Delivers the items of an iterator while the request is the latest of its channel.
+
+        Args:
+            channel: Name of the channel.
+            token: Token of the request.
+            items: Function without arguments returning the iterator to consume.
+            on_item: Function called with each item.
+        """
+        iterator = items()
+        try:
+            for item in iterator:
+                with self._callback_lock:
+                    if not self.is_current(channel, token):
+                        return
+                    on_item(item)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    def _cancel(self, channel: str) -> int:
+        """
+        Invalidates the latest request of a channel. Must be called holding the lock.
+
+        Args:
+            channel: Name of the channel.
+
+        Returns:
+            int: The token to use for the next request of the channel.
+        """
+        future = self._futures.pop(channel, None)
+        if future is not None:
+            future.cancel()
+        self._tokens[channel] = self._tokens.get(channel, 0) + 1
+        return self._tokens[channel]
+
+    def _deliver(self, channel: str, token: int, future, on_done, on_error):
+        """
+        Calls the callbacks of a completed request unless it has been superseded.
+
+        Args:
+            channel: Name of the channel.
+            token: Token of the request.
+            future (concurrent.futures.Future): The completed request.
+            on_done: Function called with the result.
+            on_error: Function called with the exception, if any.
+        """
+        if future.cancelled():
+            return
+        with self._callback_lock:
+            with self._lock:
+                if self._tokens.get(channel) != token:
+                    return
+                self._futures.pop(channel, None)
+            error = future.exception()
+            if error is None:
+                on_done(future.result())
+            elif on_error is not None:
+                on_error(error)
@@ -0,0 +1,203 @@
+"""
+This module provides the flow control applied to every request sent upstream by `helpers`.
+
+Requests first go through a circuit breaker, which fails them immediately while the
+upstream API is known to be down, then through a limiter combining a token bucket, capping
+the request rate, with an adaptive limit on the number of requests in flight. The limit
+grows by one request every time a full window of requests succeeds, and is halved when a
+request fails because of a timeout, a connection error, a server error or a "429 Too Many
+Requests" response (additive increase, multiplicative decrease). A `Retry-After` delay
+pauses every request. Failed requests are retried after a jittered exponential backoff, so
+that the clients throttled at the same time do not retry at the same time.
+
+Includes functions:
+  - backoff(attempt: int, base: float, cap: float) -> float:
+      Returns a random delay before retrying a request.
+
+Includes classes:
+  - CircuitOpenError: Raised while the circuit breaker is open.
+  - AdaptiveLimiter: Token bucket with an adaptive concurrency limit.
+  - CircuitBreaker: Fails requests immediately after repeated failures.
+"""
+
+import random
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """
+    This class is the exception raised by `CircuitBreaker.check` while requests are paused.
+    """
+
+    def __init__(self, remaining: float):
+        """
+        Initializes the exception.
+
+        Args:
+            remaining: Number of seconds until a request is allowed again.
+        """
+        super().__init__(
+            f"too many failed requests, paused for {max(remaining, 1):.0f} s"
+        )
+        self.remaining = remaining
+
+
+def backoff(attempt: int, base: float, cap: float) -> float:
+    """
+    This function returns a random delay before retrying a request, between 0 and an
+    exponentially growing bound ("full jitter").
+
+    Args:
+        attempt: Number of the failed attempt, starting from 0.
+        base: Bound of the delay after the first failure, doubled after every failure.
+        cap: Maximum delay in seconds.
+
+    Returns:
+        float: The delay in seconds.
+    """
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class AdaptiveLimiter:
+    """
+    This class limits the rate and the concurrency of requests. It can be used from several
+    threads: `acquire` blocks until a request is allowed, and every request allowed must be
+    followed by a call to `release` with its outcome.
+    """
+
+    def __init__(self, rate: float, burst: int, max_concurrency: int):
+        """
+        Initializes the limiter with a full bucket and the maximum concurrency.
+
+        Args:
+            rate: Number of requests per second allowed on average.
+            burst: Maximum number of requests allowed at once.
+            max_concurrency: Maximum number of requests in flight.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._decreased = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """
+        Waits until a request is allowed by the token bucket, the concurrency limit and any
+        pause, and takes a token and a slot for it.
+
+        Returns:
+            float: The time the request was allowed, as returned by `time.monotonic`, to be
+            passed to `release`.
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._refilled) * self.rate
+                )
+                self._refilled = now
+                wait = self._paused_until - now
+                if wait <= 0 and self._in_flight < int(self.limit):
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self._in_flight += 1
+                        return now
+                    wait = (1 - self._tokens) / self.rate
+                # Without a delay, a slot is freed by `release`.
+                self._condition.wait(wait if wait > 0 else None)
+
+    def release(self, started: float, overloaded: bool, retry_after: float = 0.0):
+        """
+        Frees the slot of a finished request and adapts the concurrency limit.
+
+        Args:
+            started: The value returned by `acquire` for the request.
+            overloaded: Whether the request failed in a way suggesting that the upstream API
+                is overloaded, e.g. a timeout or a 429 response.
+            retry_after: Number of seconds every request is paused for, e.g. from the
+                `Retry-After` header of the response.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if overloaded:
+                # Requests started before the last decrease saw the old limit.
+                if started >= self._decreased:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._decreased = now
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            if retry_after > 0:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        """
+        Returns the current concurrency limit and number of requests in flight.
+        """
+        with self._condition:
+            return {"limit": round(self.limit, 2), "in_flight": self._in_flight}
+
+
+class CircuitBreaker:
+    """
+    This class fails requests immediately once `threshold` requests in a row have failed.
+    After `cooldown` seconds, a single trial request is allowed: the breaker closes again if
+    it succeeds, and stays open for another `cooldown` otherwise.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        """
+        Initializes the breaker closed.
+
+        Args:
+            threshold: Number of consecutive failures opening the breaker.
+            cooldown: Number of seconds requests are failed for once it is open.
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def check(self):
+        """
+        Checks whether a request is allowed.
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or a trial request is in progress.
+        """
+        with self._lock:
+            if self._opened is None:
+                return
+            remaining = self._opened + self.cooldown - time.monotonic()
+            if remaining > 0 or self._trial:
+                raise CircuitOpenError(remaining)
+            self._trial = True
+
+    def record(self, success: bool | None):
+        """
+        Records the outcome of a request allowed by `check`.
+
+        Args:
+            success: Whether the upstream API answered, even with a client error, or None
+                if the request failed for another reason, e.g. an invalid address, which
+                tells nothing about the upstream API.
+        """
+        with self._lock:
+            if success:
+                self._failures = 0
+                self._opened = None
+            elif success is not None:
+                self._failures += 1
+                if self._trial or self._failures >= self.threshold:
+                    self._opened = time.monotonic()
+            # After a trial request without outcome, the next request is the trial.
+            self._trial = False
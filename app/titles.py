@@ -0,0 +1,324 @@
+"""
+This module provides a local index of the titles of every movie returned by a search, used
+to suggest titles as the user types, without any request and while offline.
+
+Titles are normalized (case folded, without accents or punctuation) and split into
+trigrams, each word being padded with two leading spaces so that the first letters of a
+word are trigrams too. A title matches a query when it contains enough of the trigrams of
+the query, which tolerates typos and words in a different order. The index keeps the most
+recently seen `TITLE_INDEX_SIZE` titles in memory.
+
+The titles are persisted as a zlib-compressed JSON list in the user cache directory, while
+the trigrams are rebuilt when the index is loaded, in a background thread. The first time,
+the index is built from the searches in the disk cache.
+
+Includes functions:
+  - normalize(title: str) -> str:
+      Normalizes a title for matching.
+  - trigrams(text: str, complete: bool = True) -> set:
+      Returns the trigrams of a normalized text.
+
+Includes classes:
+  - IndexedTitle: A movie of the index.
+  - TitleIndex: The persisted trigram index of titles.
+"""
+
+import json
+import math
+import os
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict, defaultdict
+
+from constants import TITLE_MIN_SIMILARITY
+
+
+def normalize(title: str) -> str:
+    """
+    This function normalizes a title for matching: case folded, without accents, and with
+    the punctuation replaced by spaces.
+
+    Args:
+        title: The title.
+
+    Returns:
+        str: The words of the normalized title separated by single spaces.
+    """
+    text = unicodedata.normalize("NFKD", title.casefold())
+    text = "".join(
+        c if c.isalnum() else " " for c in text if not unicodedata.combining(c)
+    )
+    return " ".join(text.split())
+
+
+def trigrams(text: str, complete: bool = True) -> set:
+    """
+    This function returns the trigrams of a normalized text, each word being padded with
+    two leading spaces and, if complete, a trailing one.
+
+    Args:
+        text: The normalized text.
+        complete: False for a query being typed, whose last word may be unfinished.
+
+    Returns:
+        set: The trigrams of the text.
+    """
+    words = text.split()
+    result = set()
+    for position, word in enumerate(words):
+        padded = f"  {word}"
+        if complete or position < len(words) - 1:
+            padded += " "
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class IndexedTitle:
+    """
+    This class holds the details of a movie of the index displayed in the suggestions.
+    """
+
+    __slots__ = ("entry_id", "title", "release_date", "poster", "key")
+
+    def __init__(self, entry_id: str, title: str, release_date: str, poster: str):
+        """
+        Initializes the movie.
+
+        Args:
+            entry_id: Unique identifier of the movie.
+            title: Title of the movie.
+            release_date: Release date of the movie, if known.
+            poster: Address of the poster of the movie, if any.
+        """
+        self.entry_id = entry_id
+        self.title = title
+        self.release_date = release_date
+        self.poster = poster
+        self.key = normalize(title)
+
+    def to_list(self) -> list:
+        """
+        Returns the movie as a JSON serializable list.
+        """
+        return [self.entry_id, self.title, self.release_date, self.poster]
+
+
+class TitleIndex:
+    """
+    This class keeps a trigram index of the titles of the movies returned by searches. It
+    can be used from several threads. Until the index is loaded, suggestions only come
+    from the movies added in the meantime, which are kept once it is.
+    """
+
+    def __init__(self, path: str, max_titles: int):
+        """
+        Initializes an empty index without loading it.
+
+        Args:
+            path: Location of the file the index is persisted to.
+            max_titles: Maximum number of titles kept, the least recently seen ones being
+                removed first.
+        """
+        self.path = path
+        self.max_titles = max_titles
+        self.loaded = False
+        self._titles = OrderedDict()
+        self._postings = defaultdict(set)
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def load_async(self):
+        """
+        Loads the index in a daemon thread.
+        """
+        threading.Thread(target=self.load, name="titles", daemon=True).start()
+
+    def load(self):
+        """
+        Loads the index from its file, or builds it from the searches in the disk cache if
+        the file does not exist yet or is malformed.
+        """
+        rows = self._read()
+        try:
+            titles, postings = self._build(rows or [])
+        except (TypeError, AttributeError):
+            # A malformed file is replaced as if it did not exist.
+            rows = None
+        if rows is None:
+            titles, postings = self._build(_cached_titles())
+        with self._lock:
+            pending = list(self._titles.values())
+            self._titles, self._postings = titles, postings
+            for title in pending:
+                self._insert(self._titles, self._postings, title)
+            self._evict()
+            self.loaded = True
+        if rows is None:
+            self.save()
+
+    def add(self, movies: list):
+        """
+        Adds the movies returned by a search to the index, or marks them as recently seen.
+        The index is saved in the background every 50 new titles.
+
+        Args:
+            movies (list of MediaEntry): The movies.
+        """
+        with self._lock:
+            for movie in movies:
+                if not movie.title:
+                    continue
+                if movie.entry_id not in self._titles:
+                    self._unsaved += 1
+                title = IndexedTitle(
+                    movie.entry_id, movie.title, movie.release_date, movie.poster
+                )
+                self._insert(self._titles, self._postings, title)
+            self._evict()
+            save = self.loaded and self._unsaved >= 50
+        if save:
+            threading.Thread(target=self.save, daemon=True).start()
+
+    def suggest(self, text: str, limit: int) -> list:
+        """
+        Returns the titles of the index best matching the text typed.
+
+        Titles are ranked by the number of trigrams of the text they contain, then titles
+        starting with the text first, then shorter titles first.
+
+        Args:
+            text: The text typed, possibly with an unfinished last word.
+            limit: Maximum number of titles returned.
+
+        Returns:
+            list of IndexedTitle: The best matches, if their similarity is at least
+            `TITLE_MIN_SIMILARITY`.
+        """
+        query = normalize(text)
+        grams = trigrams(query, complete=False)
+        if len(grams) < 2:
+            # A single letter would match a large share of the titles.
+            return []
+        needed = max(math.ceil(TITLE_MIN_SIMILARITY * len(grams)), 2)
+        with self._lock:
+            postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+            # A title missing all the rarest trigrams cannot match enough of them.
+            candidates = set().union(*postings[: len(postings) - needed + 1])
+            found = []
+            for entry_id in candidates:
+                count = sum(entry_id in posting for posting in postings)
+                if count >= needed:
+                    title = self._titles[entry_id]
+                    prefix = title.key.startswith(query)
+                    found.append((-count, not prefix, len(title.key), title))
+        found.sort(key=lambda item: item[:3])
+        return [item[3] for item in found[:limit]]
+
+    def save(self):
+        """
+        Writes the titles to the file of the index, replacing it atomically. Nothing is
+        written before the index is loaded, so that its file is not truncated. Since the
+        index can be rebuilt, a file that cannot be written is left as it is.
+
+        Returns:
+            bool: Whether the file was written.
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self.loaded:
+                    return False
+                rows = [title.to_list() for title in self._titles.values()]
+                self._unsaved = 0
+            data = zlib.compress(
+                json.dumps(
+                    {"version": 1, "titles": rows}, separators=(",", ":")
+                ).encode()
+            )
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(temp_path, "wb") as file:
+                    file.write(data)
+                os.replace(temp_path, self.path)
+            except OSError:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                return False
+            return True
+
+    def _read(self) -> list | None:
+        """
+        Reads the titles from the file of the index.
+
+        Returns:
+            The rows of the titles, least recently seen first, or None if the file does not
+            exist or cannot be read.
+        """
+        try:
+            with open(self.path, "rb") as file:
+                rows = json.loads(zlib.decompress(file.read()))["titles"]
+        except (OSError, ValueError, KeyError, TypeError, zlib.error):
+            return None
+        return rows if isinstance(rows, list) else None
+
+    def _build(self, rows) -> tuple:
+        """
+        Builds the titles and the trigrams of an index.
+
+        Args:
+            rows: The rows of the titles, least recently seen first.
+
+        Returns:
+            tuple: The titles by identifier and the identifiers by trigram.
+
+        Raises:
+            TypeError, AttributeError: If a row is malformed.
+        """
+        titles, postings = OrderedDict(), defaultdict(set)
+        for row in rows:
+            self._insert(titles, postings, IndexedTitle(*row))
+        return titles, postings
+
+    def _insert(self, titles: OrderedDict, postings: dict, title: IndexedTitle):
+        """
+        Inserts a title as the most recently seen, replacing the previous version.
+        """
+        previous = titles.pop(title.entry_id, None)
+        if previous is not None:
+            for gram in trigrams(previous.key):
+                postings[gram].discard(previous.entry_id)
+        titles[title.entry_id] = title
+        for gram in trigrams(title.key):
+            postings[gram].add(title.entry_id)
+
+    def _evict(self):
+        """
+        Removes the least recently seen titles beyond `max_titles`. Must be called holding
+        the lock.
+        """
+        while len(self._titles) > self.max_titles:
+            _, title = self._titles.popitem(last=False)
+            for gram in trigrams(title.key):
+                self._postings[gram].discard(title.entry_id)
+                if not self._postings[gram]:
+                    del self._postings[gram]
+
+
+def _cached_titles():
+    """
+    This function yields the rows of the titles of the searches in the disk cache, least
+    recently seen first.
+    """
+    from helpers import DISK_CACHE
+
+    for _, movies in reversed(DISK_CACHE.items("search")):
+        for movie in movies:
+            if movie.title:
+                yield [movie.entry_id, movie.title, movie.release_date, movie.poster]
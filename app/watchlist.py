@@ -0,0 +1,385 @@
+"""
+This module provides a persisted watchlist of movies whose offers are refreshed in the
+background.
+
+The watchlist is stored as a zlib-compressed JSON file. For each movie it keeps its
+details, the offers found by the last refresh, in the shape returned by `offers_as_dict`
+without the services that have no offer, and how often they changed recently. A refresher thread checks one movie at a time, at most once every
+`WATCHLIST_INTERVAL` seconds and within a budget of requests per time window, starting from
+the movies never checked and then from the oldest ones. Movies whose offers changed
+recently are checked more often. The offers of every refresh are compared to the previous
+ones, and the differences, e.g. a new service or a price change in a country, are reported
+to a callback.
+
+Includes functions:
+  - diff_offers(old: dict, new: dict) -> list:
+      Lists the differences between two sets of offers.
+  - describe_changes(changes: list, limit: int = 3) -> str:
+      Summarizes a list of differences in a sentence.
+
+Includes classes:
+  - Watchlist: The persisted list of watched movies.
+  - WatchlistRefresher: Refreshes the offers of the watched movies in the background.
+"""
+
+import json
+import os
+import threading
+import time
+import zlib
+from collections import deque
+
+from constants import ORDERED_SERVICES
+from helpers import PartialOffers, movie_to_dict, offers_as_dict, refresh_offers
+
+
+def diff_offers(old: dict, new: dict) -> list:
+    """
+    This function lists the differences between two sets of offers of a movie.
+
+    Args:
+        old: The previous offers, with the structure returned by `offers_as_dict`.
+        new: The current offers, with the same structure.
+
+    Returns:
+        A list of dictionaries with the "country" and "service" of each offer that was
+        "added", "removed" or whose "price" changed (in "change"), and its "old" and "new"
+        prices.
+    """
+    changes = []
+    for country in sorted(set(old) | set(new)):
+        for service in ORDERED_SERVICES:
+            before = old.get(country, {}).get(service)
+            after = new.get(country, {}).get(service)
+            if before is None and after is None:
+                continue
+            if before is None:
+                change = "added"
+            elif after is None:
+                change = "removed"
+            elif before["price"] != after["price"]:
+                change = "price"
+            else:
+                continue
+            changes.append(
+                {
+                    "country": country,
+                    "service": service,
+                    "change": change,
+                    "old": before and before["price"],
+                    "new": after and after["price"],
+                }
+            )
+    return changes
+
+
+def describe_changes(changes: list, limit: int = 3) -> str:
+    """
+    This function summarizes a list of differences returned by `diff_offers`.
+
+    Args:
+        changes: The differences.
+        limit: Maximum number of differences described individually.
+
+    Returns:
+        A sentence such as "Netflix added in IT, Apple TV 3.99 $ -> 2.99 $ in US".
+    """
+    parts = []
+    for change in changes[:limit]:
+        if change["change"] == "price":
+            what = f"{change['old'] or 'included'} -> {change['new'] or 'included'}"
+        else:
+            what = change["change"]
+        parts.append(f"{change['service']} {what} in {change['country']}")
+    if len(changes) > limit:
+        parts.append(f"{len(changes) - limit} more")
+    return ", ".join(parts)
+
+
+class Watchlist:
+    """
+    This class keeps the watched movies in a compressed JSON file, which is rewritten
+    atomically after every change. It can be used from several threads. A change that
+    cannot be saved is undone, except for the refreshes, which are saved with the next
+    change.
+    """
+
+    def __init__(self, path: str):
+        """
+        Loads the watchlist, or starts an empty one if the file does not exist or cannot be
+        read.
+
+        Args:
+            path: Location of the file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            if not data.startswith(b"{"):
+                # Files written by the first version were not compressed.
+                data = zlib.decompress(data)
+            entries = json.loads(data)["entries"]
+        except (OSError, ValueError, KeyError, TypeError, zlib.error):
+            entries = None
+        self._entries = entries if isinstance(entries, dict) else {}
+
+    def __contains__(self, entry_id: str) -> bool:
+        return entry_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entries(self) -> list:
+        """
+        Returns the watched movies, as dictionaries with the details of the movie ("movie"),
+        the countries watched ("countries", None for all), the time it was "added" and last
+        "checked", its "offers" and their "volatility", between 0 and 1.
+        """
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+    def add(self, movie, countries: set | None = None) -> bool:
+        """
+        Adds a movie to the watchlist. Its offers are retrieved by the next refresh.
+
+        Args:
+            movie (MediaEntry): The movie, as returned by `find_titles`.
+            countries: 2-letter ISO codes of the countries to watch. By default, every
+                country is watched.
+
+        Returns:
+            bool: Whether the movie was added, False if the watchlist could not be saved.
+        """
+        entry = {
+            "movie": movie_to_dict(movie),
+            "countries": sorted(countries) if countries else None,
+            "added": time.time(),
+            "checked": None,
+            "offers": None,
+            "volatility": 0.0,
+        }
+        with self._lock:
+            previous = self._entries.get(movie.entry_id)
+            self._entries[movie.entry_id] = entry
+        return self._save() or self._undo(movie.entry_id, entry, previous)
+
+    def remove(self, entry_id: str) -> bool:
+        """
+        Removes a movie from the watchlist, if present.
+
+        Args:
+            entry_id: Unique identifier of the movie.
+
+        Returns:
+            bool: Whether the movie is no longer in the watchlist, False if the watchlist
+            could not be saved.
+        """
+        with self._lock:
+            previous = self._entries.pop(entry_id, None)
+        if previous is None:
+            return True
+        return self._save() or self._undo(entry_id, None, previous)
+
+    def next_due(self, min_age: float) -> dict | None:
+        """
+        Returns the movie to refresh next: a movie never checked if any, otherwise the one
+        checked longest ago, relative to how volatile its offers are.
+
+        Args:
+            min_age: Number of seconds after which the offers of a movie whose offers never
+                change are refreshed. Volatile movies are refreshed up to twice as often.
+
+        Returns:
+            A copy of the entry of the movie, or None if no movie is due.
+        """
+        now = time.time()
+        best, best_score = None, 1.0
+        with self._lock:
+            for entry in self._entries.values():
+                if entry["checked"] is None:
+                    return dict(entry)
+                age = now - entry["checked"]
+                score = age * (1 + entry["volatility"]) / min_age
+                if score >= best_score:
+                    best, best_score = entry, score
+            return best and dict(best)
+
+    def update(self, entry_id: str, offers: dict | None) -> list:
+        """
+        Records the result of a refresh of a movie.
+
+        Args:
+            entry_id: Unique identifier of the movie.
+            offers: The offers found, with the structure returned by `offers_as_dict`, or
+                None if the refresh failed. The services without offer are not kept.
+
+        Returns:
+            The differences with the previous offers, as returned by `diff_offers`. The
+            first refresh of a movie, and failed ones, do not report any difference.
+        """
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                return []
+            entry["checked"] = time.time()
+            changes = []
+            if offers is not None:
+                offers = {
+                    country: {s: o for s, o in services.items() if o is not None}
+                    for country, services in offers.items()
+                }
+                if entry["offers"] is not None:
+                    changes = diff_offers(entry["offers"], offers)
+                    entry["volatility"] = entry["volatility"] / 2 + bool(changes) / 2
+                entry["offers"] = offers
+        self._save()
+        return changes
+
+    def _undo(self, entry_id: str, entry: dict | None, previous: dict | None) -> bool:
+        """
+        Undoes a change of an entry that could not be saved, unless it changed since.
+
+        Args:
+            entry_id: Unique identifier of the movie.
+            entry: The entry after the change, None if it was removed.
+            previous: The entry before the change, None if there was none.
+
+        Returns:
+            bool: Always False, the change having failed.
+        """
+        with self._lock:
+            if self._entries.get(entry_id) is entry:
+                if previous is None:
+                    self._entries.pop(entry_id, None)
+                else:
+                    self._entries[entry_id] = previous
+        return False
+
+    def _save(self) -> bool:
+        """
+        Writes the watchlist to its file, replacing it atomically. The entries are copied
+        holding the lock, and serialized and written without it.
+
+        Returns:
+            bool: Whether the file was written.
+        """
+        with self._save_lock:
+            with self._lock:
+                # The offers of an entry are replaced, never modified in place.
+                entries = {key: dict(entry) for key, entry in self._entries.items()}
+            data = zlib.compress(
+                json.dumps(
+                    {"version": 2, "entries": entries}, separators=(",", ":")
+                ).encode()
+            )
+            temp_path = f"{self.path}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(temp_path, "wb") as file:
+                    file.write(data)
+                os.replace(temp_path, self.path)
+            except OSError:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                return False
+            return True
+
+
+class WatchlistRefresher:
+    """
+    This class refreshes the offers of the watched movies one at a time in a background
+    thread, spreading the requests over time and within a budget.
+    """
+
+    def __init__(
+        self,
+        watchlist: Watchlist,
+        on_changes,
+        interval: float,
+        budget: int,
+        window: float,
+        min_age: float,
+    ):
+        """
+        Initializes the refresher without starting it.
+
+        Args:
+            watchlist: The watched movies.
+            on_changes: Function called with the entry of a movie and the list of
+                differences returned by `diff_offers`, when its offers changed.
+            interval: Number of seconds between two refreshes.
+            budget: Maximum number of refreshes within `window` seconds.
+            window: Length in seconds of the budget window.
+            min_age: Number of seconds after which the offers of a movie are refreshed.
+        """
+        self.watchlist = watchlist
+        self.on_changes = on_changes
+        self.interval = interval
+        self.budget = budget
+        self.window = window
+        self.min_age = min_age
+        self._started = deque()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Starts refreshing in a daemon thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="watchlist", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops refreshing after the refresh in progress, if any.
+        """
+        self._stop.set()
+
+    def refresh_next(self) -> bool:
+        """
+        Refreshes the offers of the movie that is due next, if the budget allows it.
+
+        Returns:
+            bool: Whether a movie was refreshed.
+        """
+        now = time.monotonic()
+        while self._started and self._started[0] < now - self.window:
+            self._started.popleft()
+        if len(self._started) >= self.budget:
+            return False
+        entry = self.watchlist.next_due(self.min_age)
+        if entry is None:
+            return False
+        self._started.append(now)
+        entry_id = entry["movie"]["entry_id"]
+        countries = entry["countries"] and set(entry["countries"])
+        try:
+            offers = refresh_offers(entry_id, countries)
+        except Exception:
+            offers = None
+        if isinstance(offers, PartialOffers):
+            # Missing countries would be reported as removed offers.
+            offers = None
+        changes = self.watchlist.update(entry_id, offers and offers_as_dict(offers))
+        if changes:
+            self.on_changes(entry, changes)
+        return True
+
+    def _run(self):
+        """
+        Refreshes a movie every `interval` seconds until the refresher is stopped.
+        """
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh_next()
+            except Exception:
+                # A failing callback must not stop the refreshes.
+                pass
@@ -0,0 +1,254 @@
+"""
+This module provides a local stand-in for the JustWatch GraphQL endpoint.
+
+The server answers the `GetSearchTitles` and `GetTitleOffers` queries sent by
+`simplejustwatchapi` with canned payloads of realistic size, after a configurable latency
+with a configurable share of failed responses and, optionally, "429 Too Many Requests"
+responses beyond a number of concurrent requests.
+
+Includes classes:
+  - FakeJustWatch: A threaded HTTP server imitating the JustWatch GraphQL API.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SERVICES = [
+    "Netflix",
+    "Amazon Video",
+    "Amazon Prime Video",
+    "Apple TV",
+    "Disney Plus",
+    "Rakuten TV",
+    "Movistar Plus",
+    "Google Play Movies",
+    "Microsoft Store",
+    "Mubi",
+    "Tubi TV",
+]
+"""
+Names of the packages returned for every country. They include the services displayed by the
+application, the duplicated Prime Video name and services that are filtered out.
+"""
+
+_COUNTRY_ENTRY = re.compile(r"(\w{2}): offers\(country:")
+_DESCRIPTION = "A fake movie served by the local benchmark server. " * 4
+
+
+class FakeJustWatch:
+    """
+    This class runs a fake JustWatch GraphQL server in a background thread.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        capacity: int | None = None,
+    ):
+        """
+        Initializes the server without starting it.
+
+        Args:
+            latency: Number of seconds each response is delayed by.
+            error_rate: Share of requests, between 0 and 1, answered with an error.
+            seed: Seed of the random generator used for error injection.
+            capacity: Maximum number of requests handled at the same time. Requests beyond
+                it are answered with a 429 status after the latency (optional).
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = 500
+        self.capacity = capacity
+        self.requests = 0
+        self.throttled = 0
+        self._active = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        """
+        Returns the URL of the GraphQL endpoint of the running server.
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/graphql"
+
+    def start(self) -> str:
+        """
+        Starts the server on a free local port.
+
+        Returns:
+            The URL of the GraphQL endpoint.
+        """
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                status, body = fake.respond(json.loads(self.rfile.read(length)))
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def respond(self, request: dict) -> tuple:
+        """
+        Builds the response to a GraphQL request.
+
+        Args:
+            request: The JSON body of the request.
+
+        Returns:
+            A tuple `(status, body)` with the HTTP status and the JSON body of the response.
+        """
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.error_rate
+            throttled = self.capacity is not None and self._active >= self.capacity
+            if throttled:
+                self.throttled += 1
+            else:
+                self._active += 1
+        time.sleep(self.latency)
+        if throttled:
+            return 429, {"errors": [{"message": "Too many requests"}]}
+        with self._lock:
+            self._active -= 1
+        if failed:
+            return self.error_status, {"errors": [{"message": "Injected error"}]}
+        variables = request.get("variables", {})
+        if request.get("operationName") == "GetSearchTitles":
+            query = variables["searchTitlesFilter"]["searchQuery"]
+            return 200, search_payload(query, variables["first"])
+        countries = _COUNTRY_ENTRY.findall(request.get("query", ""))
+        return 200, offers_payload(variables["nodeId"], countries)
+
+
+def search_payload(query: str, count: int) -> dict:
+    """
+    Builds the response of a `GetSearchTitles` query.
+
+    Args:
+        query: The title searched.
+        count: The number of results requested.
+
+    Returns:
+        The JSON body of the response.
+    """
+    nodes = [
+        {
+            "id": f"tm{index}",
+            "objectId": index,
+            "objectType": "MOVIE",
+            "content": {
+                "title": f"{query.title()} {index}",
+                "fullPath": f"/us/movie/fake-{index}",
+                "originalReleaseYear": 2000 + index % 20,
+                "originalReleaseDate": f"{2000 + index % 20}-01-01",
+                "runtime": 90 + index,
+                "shortDescription": _DESCRIPTION,
+                "genres": [{"shortName": "act"}, {"shortName": "drm"}],
+                "externalIds": {"imdbId": f"tt{index:07d}"},
+                "posterUrl": f"/poster/{index}/s718/fake.jpg",
+                "backdrops": [{"backdropUrl": f"/backdrop/{index}/s1920/fake.jpg"}],
+            },
+            "offers": [],
+        }
+        for index in range(count)
+    ]
+    return {"data": {"popularTitles": {"edges": [{"node": n} for n in nodes]}}}
+
+
+def offers_payload(node_id: str, countries: list) -> dict:
+    """
+    Builds the response of a `GetTitleOffers` query, with an offer of every service in
+    every country requested.
+
+    Args:
+        node_id: The identifier of the movie.
+        countries: The 2-letter ISO codes of the countries requested.
+
+    Returns:
+        The JSON body of the response.
+    """
+    return {
+        "data": {
+            "node": {
+                country: [
+                    _offer(node_id, country, index, service)
+                    for index, service in enumerate(SERVICES)
+                ]
+                for country in countries
+            }
+        }
+    }
+
+
+def _offer(node_id: str, country: str, index: int, service: str) -> dict:
+    """
+    Builds a single offer of a `GetTitleOffers` response.
+
+    Args:
+        node_id: The identifier of the movie.
+        country: The 2-letter ISO code of the country.
+        index: The index of the service.
+        service: The name of the service.
+
+    Returns:
+        The JSON representation of the offer.
+    """
+    rent = index % 2 == 1
+    return {
+        "id": f"{node_id}-{country}-{index}",
+        "monetizationType": "RENT" if rent else "FLATRATE",
+        "presentationType": "HD",
+        "retailPrice": f"{index + 2}.99 $" if rent else None,
+        "retailPriceValue": index + 2.99 if rent else None,
+        "currency": "USD",
+        "lastChangeRetailPriceValue": None,
+        "type": "STANDARD",
+        "package": {
+            "id": index,
+            "packageId": index,
+            "clearName": service,
+            "technicalName": service.lower().replace(" ", ""),
+            "icon": f"/icon/{index}/s100/fake.png",
+        },
+        "standardWebURL": f"https://example.com/{country}/{node_id}/{index}",
+        "elementCount": 1,
+        "availableTo": None,
+        "deeplinkRoku": None,
+        "subtitleLanguages": ["en"],
+        "videoTechnology": [],
+        "audioTechnology": [],
+        "audioLanguages": ["en"],
+    }
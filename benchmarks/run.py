@@ -0,0 +1,277 @@
+"""
+Benchmark suite for the search, offers and rendering hot paths of Watch Movies.
+
+The suite starts a local stand-in of the JustWatch GraphQL endpoint (see `fake_justwatch.py`),
+points the HTTP client of `helpers` at it and times:
+  - the startup of the application, from a new interpreter to the search window being
+    built,
+  - `find_titles` and `find_offers`, with cold and warm caches, and `find_offers` against a
+    server answering "429 Too Many Requests" beyond `THROTTLED_CAPACITY` concurrent requests,
+  - `group_offers` and `complete_dict` on the raw offers of every country,
+  - the construction of the movie cards (`_create_card`) and of the offers page
+    (`create_offers_page`), without a Flet client attached.
+
+Results are printed, or written to the file passed with `--output`, as JSON so that runs of
+different commits can be compared.
+
+Usage:
+    python benchmarks/run.py [--latency 0.05] [--error-rate 0] [--repeat 5] [--output FILE]
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_justwatch import FakeJustWatch
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT_DIR, "app")
+BENCHMARKS_DIR = os.path.join(ROOT_DIR, "benchmarks")
+THROTTLED_CAPACITY = 3
+
+
+class HeadlessPage:
+    """
+    This class stands in for `ft.Page`, so that control trees can be built and measured
+    without a Flet client.
+    """
+
+    def __init__(self):
+        self.controls = []
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+
+    def update(self, *_):
+        pass
+
+    def scroll_to(self, **_):
+        pass
+
+
+def measure(fn, repeat: int, setup=None) -> dict:
+    """
+    Times a function several times.
+
+    Args:
+        fn: Function without arguments to time.
+        repeat: Number of timed runs.
+        setup: Function without arguments called before each run, not timed (optional).
+
+    Returns:
+        A dictionary with the number of runs and the minimum, median, mean and maximum
+        durations in milliseconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return {
+        "runs": repeat,
+        "min_ms": round(min(durations), 3),
+        "median_ms": round(statistics.median(durations), 3),
+        "mean_ms": round(statistics.fmean(durations), 3),
+        "max_ms": round(max(durations), 3),
+    }
+
+
+def count_controls(control) -> int:
+    """
+    Counts the controls of a Flet control tree.
+
+    Args:
+        control (ft.Control): The root of the tree.
+
+    Returns:
+        int: The number of controls in the tree, root included.
+    """
+    return 1 + sum(count_controls(child) for child in control._get_children())
+
+
+def git_commit() -> str | None:
+    """
+    Returns the commit of the working tree, if available.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure_startup(repeat: int) -> dict:
+    """
+    Times the startup of the application in new interpreters, each importing `main` and
+    building the search window on a `HeadlessPage`.
+
+    Args:
+        repeat: Number of timed runs.
+
+    Returns:
+        A dictionary with the durations, as returned by `measure`.
+    """
+    code = (
+        "from run import HeadlessPage; import main; " "main.App().main(HeadlessPage())"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([BENCHMARKS_DIR, APP_DIR]))
+    return measure(
+        lambda: subprocess.run(
+            [sys.executable, "-c", code], cwd=APP_DIR, env=env, check=True
+        ),
+        repeat,
+    )
+
+
+def run(args) -> dict:
+    """
+    Runs every benchmark against a fake JustWatch server.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        A dictionary with the settings of the run and the results of each benchmark.
+    """
+    os.environ["WATCH_MOVIES_CACHE_DIR"] = tempfile.mkdtemp(prefix="watch-movies-")
+    sys.path.insert(0, APP_DIR)
+    from PIL import Image
+
+    import helpers
+    from constants import ALL_COUNTRIES
+    from main import App
+
+    server = FakeJustWatch(args.latency, args.error_rate)
+    helpers.API_URL = server.start()
+
+    def clear_caches():
+        helpers.SEARCH_CACHE.clear()
+        helpers.OFFERS_CACHE.clear()
+        helpers.DISK_CACHE.clear()
+
+    results = {"startup": measure_startup(args.repeat)}
+    try:
+        title, country, language = "matrix", "US", "en"
+        results["find_titles_cold"] = measure(
+            lambda: helpers.find_titles(title, country, language),
+            args.repeat,
+            clear_caches,
+        )
+        results["find_titles_warm"] = measure(
+            lambda: helpers.find_titles(title, country, language), args.repeat
+        )
+        results["find_offers_cold"] = measure(
+            lambda: helpers.find_offers("tm1"), args.repeat, clear_caches
+        )
+        results["find_offers_warm"] = measure(
+            lambda: helpers.find_offers("tm1"), args.repeat
+        )
+        server.capacity = THROTTLED_CAPACITY
+        partial = []
+        results["find_offers_throttled"] = measure(
+            lambda: partial.append(
+                isinstance(helpers.find_offers("tm1"), helpers.PartialOffers)
+            ),
+            args.repeat,
+            clear_caches,
+        )
+        results["find_offers_throttled"].update(
+            throttled=server.throttled,
+            partial=sum(partial),
+            limit=helpers.cache_stats()["upstream"]["limit"],
+        )
+        server.capacity = None
+        raw_offers = helpers.fetch_offers_sharded("tm1", ALL_COUNTRIES)
+        results["group_offers"] = measure(
+            lambda: helpers.group_offers(raw_offers), args.repeat
+        )
+        grouped = {
+            country: {offer.package.name: offer for offer in offers}
+            for country, offers in raw_offers.items()
+        }
+        results["complete_dict"] = measure(
+            lambda: helpers.complete_dict(dict(grouped)), args.repeat
+        )
+
+        app = App()
+        app.main(HeadlessPage())
+        movies = helpers.find_titles(title, country, language)
+        thumbnail = io.BytesIO()
+        Image.new("RGB", (280, 420)).save(thumbnail, "JPEG")
+        for movie in movies:
+            with open(app.posters.path(movie.poster), "wb") as file:
+                file.write(thumbnail.getvalue())
+        results["create_card"] = measure(
+            lambda: [app._create_card(movie) for movie in movies], args.repeat
+        )
+        results["create_card"]["cards"] = len(movies)
+
+        offers = helpers.find_offers("tm1")
+
+        def create_offers_page():
+            app.offers = dict(offers)
+            app.offers_scope = ALL_COUNTRIES
+            app.create_offers_page()
+
+        results["create_offers_page"] = measure(create_offers_page, args.repeat)
+        results["create_offers_page"]["controls"] = count_controls(app.offers_view)
+        rows = []
+        results["offer_rows_all_countries"] = measure(
+            lambda: rows.extend(app._create_offer_row(c) for c in sorted(offers)),
+            args.repeat,
+            rows.clear,
+        )
+        results["offer_rows_all_countries"]["rows"] = len(offers)
+        results["offer_rows_all_countries"]["controls"] = sum(
+            count_controls(row) for row in rows
+        )
+    finally:
+        server.stop()
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "repeat": args.repeat,
+        },
+        "requests": server.requests,
+        "results": results,
+    }
+
+
+def main():
+    """
+    Parses the command line arguments, runs the suite and outputs its results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="file where the JSON results are written")
+    args = parser.parse_args()
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
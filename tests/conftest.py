@@ -0,0 +1,11 @@
+"""
+Makes the modules of the application importable by the tests, the way `main.py` imports
+them, and keeps their disk cache out of the user cache directory.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "app"))
+os.environ["WATCH_MOVIES_CACHE_DIR"] = tempfile.mkdtemp(prefix="watch-movies-tests-")
@@ -0,0 +1,113 @@
+"""
+Tests of the requests sent upstream by `helpers`.
+"""
+
+import threading
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import helpers
+from cache import CountingCache
+from throttle import AdaptiveLimiter, CircuitBreaker, CircuitOpenError
+
+
+class ClosedClient:
+    """
+    This class stands in for an HTTP client failing with an error which is not an
+    `httpx.HTTPError`.
+    """
+
+    def request(self, *args, **kwargs):
+        raise RuntimeError("Cannot send a request, as the client has been closed.")
+
+
+class ProxyClient:
+    """
+    This class stands in for an HTTP client behind a proxy answering with an HTML page.
+    """
+
+    def request(self, method, url, **kwargs):
+        request = httpx.Request(method, url)
+        return httpx.Response(200, text="<html>Sign in</html>", request=request)
+
+
+@pytest.mark.parametrize(
+    "client, error", [(ClosedClient, RuntimeError), (ProxyClient, ValueError)]
+)
+def test_send_frees_its_slot_on_any_error(monkeypatch, client, error):
+    limiter, breaker = AdaptiveLimiter(1000, 1000, 2), CircuitBreaker(3, 0.05)
+    monkeypatch.setattr(helpers, "_LIMITER", limiter)
+    monkeypatch.setattr(helpers, "_BREAKER", breaker)
+    monkeypatch.setattr(helpers, "_client", client)
+    for _ in range(5):
+        with pytest.raises(error):
+            helpers._send("POST", "http://localhost", retries=2)
+    assert limiter.stats()["in_flight"] == 0
+    # The error is not the upstream API's fault: the breaker stays closed.
+    breaker.check()
+    breaker.record(True)
+    # Nor is it a success: a half-open breaker stays half-open.
+    for _ in range(3):
+        breaker.check()
+        breaker.record(False)
+    threading.Event().wait(0.05)
+    with pytest.raises(error):
+        helpers._send("POST", "http://localhost", retries=2)
+    breaker.check()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_search_of_a_cached_title_keeps_its_fuzzy_matches(monkeypatch):
+    cache = CountingCache(10, 60)
+    monkeypatch.setattr(helpers, "SEARCH_CACHE", cache)
+    movies = [
+        SimpleNamespace(title="Le Fabuleux Destin d'Amélie Poulain"),
+        SimpleNamespace(title="Amelie from Montmartre"),
+    ]
+    cache.set(("amelie", "FR", "fr"), movies)
+    assert helpers.find_titles_by_prefix(" Amelie", "FR", "fr") == movies
+    assert helpers.find_titles_by_prefix("Amelie", "US", "en") is None
+
+
+def test_search_of_a_longer_title_filters_the_cached_prefix(monkeypatch):
+    cache = CountingCache(10, 60)
+    monkeypatch.setattr(helpers, "SEARCH_CACHE", cache)
+    movies = [SimpleNamespace(title="The Matrix"), SimpleNamespace(title="Matrix")]
+    cache.set(("the", "US", "en"), movies[:1])
+    cache.set(("the matrix", "US", "en"), movies)
+    assert helpers.find_titles_by_prefix("the matrix", "US", "en") == movies
+    assert helpers.find_titles_by_prefix("the matrix r", "US", "en") == []
+    assert helpers.find_titles_by_prefix("the mat", "US", "en") == movies[:1]
+
+
+def test_opening_offers_joins_the_prefetch_in_flight(monkeypatch):
+    release, fetched = threading.Event(), []
+
+    def fetch_offers_sharded(movie_id, countries):
+        fetched.append(movie_id)
+        release.wait(5)
+        return {}
+
+    def iter_offer_shards(*args):
+        raise AssertionError("the offers were requested twice")
+
+    monkeypatch.setattr(helpers, "fetch_offers_sharded", fetch_offers_sharded)
+    monkeypatch.setattr(helpers, "_iter_offer_shards", iter_offer_shards)
+    prefetch = threading.Thread(target=helpers.find_offers, args=("tm-prefetched",))
+    prefetch.start()
+    while not fetched:
+        threading.Event().wait(0.01)
+    threading.Timer(0.1, release.set).start()
+    assert list(helpers.iter_offers("tm-prefetched", "US")) == [{}]
+    prefetch.join()
+    assert fetched == ["tm-prefetched"]
+
+
+def test_offers_scope_accepts_countries_and_regions():
+    assert helpers.resolve_countries("NA", "US") == {"NA"}
+    assert helpers.resolve_countries("northam, it", "US") == {"CA", "IT", "MX", "US"}
+    assert helpers.resolve_countries("HOME NORDICS", "fr") >= {"FR", "NO", "SE"}
+    assert helpers.resolve_countries("XX", "US") == helpers.ALL_COUNTRIES
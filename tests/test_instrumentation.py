@@ -0,0 +1,29 @@
+"""
+Tests of the timing spans and counters.
+"""
+
+import json
+
+import instrumentation
+
+
+def test_spans_and_counters_are_written(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    instrumentation.configure(str(path))
+    try:
+        with instrumentation.span("network.search") as span:
+            span.set(results=4)
+        instrumentation.count("payload.bytes", 512)
+        instrumentation.flush()
+    finally:
+        instrumentation.configure(None)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines[0]["name"] == "network.search" and lines[0]["results"] == 4
+    assert lines[-1]["type"] == "counters" and lines[-1]["payload.bytes"] >= 512
+
+
+def test_unwritable_trace_leaves_instrumentation_disabled(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    instrumentation.configure(str(blocker / "trace.jsonl"))
+    assert not instrumentation.ENABLED
@@ -0,0 +1,29 @@
+"""
+Tests of the handlers of the search window.
+"""
+
+from types import SimpleNamespace
+
+import helpers
+import main
+from cache import CountingCache
+
+
+def test_typing_a_cached_prefix_still_schedules_the_search(monkeypatch):
+    cache = CountingCache(10, 60)
+    monkeypatch.setattr(helpers, "SEARCH_CACHE", cache)
+    cache.set(("amelie", "FR", "fr"), [SimpleNamespace(title="Amelie")])
+    app = main.App()
+    app.search_bar = {
+        "country": SimpleNamespace(value="FR"),
+        "language": SimpleNamespace(value="fr"),
+    }
+    shown = []
+    monkeypatch.setattr(app, "show_suggestions", lambda text: None)
+    monkeypatch.setattr(app.tasks, "submit", lambda key, fn, *args: shown.append(fn()))
+    app.title_changed(SimpleNamespace(control=SimpleNamespace(value="Amelie P")))
+    try:
+        assert shown == [[]]
+        assert app.search_timer is not None
+    finally:
+        app.cancel_typing_search()
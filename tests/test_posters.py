@@ -0,0 +1,15 @@
+"""
+Tests of the local cache of movie posters.
+"""
+
+from posters import PosterCache
+
+
+def test_unusable_directory_disables_the_cache(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    posters = PosterCache(str(blocker / "posters"), 1000, 100, workers=1)
+    url = "https://images.justwatch.com/poster/1/s592"
+    assert not posters.enabled
+    assert posters.get(url) is None
+    assert posters.fetch(url) == url
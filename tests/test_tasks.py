@@ -0,0 +1,45 @@
+"""
+Tests of the runner delivering only the results of the latest request of each channel.
+"""
+
+import threading
+
+from tasks import LatestTaskRunner
+
+
+def test_nothing_is_delivered_once_the_channel_is_cancelled():
+    runner = LatestTaskRunner(max_workers=1)
+    painting, resume, painted = threading.Event(), threading.Event(), []
+
+    def on_item(item):
+        painting.set()
+        resume.wait(5)
+        painted.append(item)
+
+    runner.submit_stream("page", lambda: iter([1, 2, 3]), on_item)
+    assert painting.wait(5)
+    cancelled = threading.Event()
+
+    def cancel():
+        runner.cancel("page")
+        cancelled.set()
+
+    threading.Thread(target=cancel).start()
+    # The cancellation waits for the item being painted.
+    assert not cancelled.wait(0.1)
+    resume.set()
+    assert cancelled.wait(5)
+    painted_when_cancelled = list(painted)
+    threading.Event().wait(0.1)
+    assert painted == painted_when_cancelled
+
+
+def test_callbacks_can_submit_requests():
+    runner = LatestTaskRunner()
+    done = threading.Event()
+    runner.submit(
+        "page",
+        lambda: 1,
+        lambda _: runner.submit("page", lambda: 2, lambda value: done.set()),
+    )
+    assert done.wait(5)
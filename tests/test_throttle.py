@@ -0,0 +1,160 @@
+"""
+Tests of the flow control of upstream requests: the adaptive concurrency limit, the token
+bucket and the circuit breaker.
+"""
+
+import threading
+import time
+
+import pytest
+
+import throttle
+from throttle import AdaptiveLimiter, CircuitBreaker, CircuitOpenError, backoff
+
+
+class FakeClock:
+    """
+    This class stands in for the `time` module of `throttle`, with a clock only moving
+    when told to.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(throttle, "time", fake)
+    return fake
+
+
+def test_backoff_is_bounded():
+    for attempt in range(10):
+        delay = backoff(attempt, 0.5, 4.0)
+        assert 0 <= delay <= min(4.0, 0.5 * 2**attempt)
+
+
+def test_limit_is_halved_on_overload_and_grows_back():
+    limiter = AdaptiveLimiter(rate=1000, burst=1000, max_concurrency=8)
+    started = limiter.acquire()
+    limiter.release(started, overloaded=True)
+    assert limiter.limit == 4
+    # A window of 4 successes grows the limit by about one request.
+    for _ in range(4):
+        limiter.release(limiter.acquire(), overloaded=False)
+    assert 4.9 < limiter.limit < 5
+    for _ in range(100):
+        limiter.release(limiter.acquire(), overloaded=False)
+    assert limiter.limit == 8
+
+
+def test_limit_is_halved_once_per_window_of_requests():
+    limiter = AdaptiveLimiter(rate=1000, burst=1000, max_concurrency=8)
+    first, second = limiter.acquire(), limiter.acquire()
+    time.sleep(0.01)
+    limiter.release(first, overloaded=True)
+    # The second request was sent before the decrease, with the old limit.
+    limiter.release(second, overloaded=True)
+    assert limiter.limit == 4
+    limiter.release(limiter.acquire(), overloaded=True)
+    assert limiter.limit == 2
+    for _ in range(5):
+        limiter.release(limiter.acquire(), overloaded=True)
+    assert limiter.limit == 1
+
+
+def test_concurrency_is_capped_by_the_limit():
+    limiter = AdaptiveLimiter(rate=1000, burst=1000, max_concurrency=2)
+    held = [limiter.acquire(), limiter.acquire()]
+    acquired = threading.Event()
+
+    def acquire():
+        limiter.acquire()
+        acquired.set()
+
+    threading.Thread(target=acquire, daemon=True).start()
+    assert not acquired.wait(0.1)
+    assert limiter.stats() == {"limit": 2, "in_flight": 2}
+    limiter.release(held.pop(), overloaded=False)
+    assert acquired.wait(1)
+
+
+def test_token_bucket_caps_the_rate_after_a_burst():
+    limiter = AdaptiveLimiter(rate=20, burst=3, max_concurrency=10)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.release(limiter.acquire(), overloaded=False)
+    assert time.monotonic() - start < 0.04
+    for _ in range(2):
+        limiter.release(limiter.acquire(), overloaded=False)
+    # Two more tokens take 0.1 s to be refilled at 20 per second.
+    assert time.monotonic() - start >= 0.09
+
+
+def test_retry_after_pauses_every_request(clock):
+    limiter = AdaptiveLimiter(rate=1000, burst=1000, max_concurrency=4)
+    limiter.release(limiter.acquire(), overloaded=True, retry_after=5)
+    acquired = threading.Event()
+
+    def acquire():
+        limiter.acquire()
+        acquired.set()
+
+    threading.Thread(target=acquire, daemon=True).start()
+    assert not acquired.wait(0.1)
+    clock.now += 5
+    with limiter._condition:
+        limiter._condition.notify_all()
+    assert acquired.wait(1)
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=30)
+    for success in (False, False, True, False, False):
+        breaker.check()
+        breaker.record(success)
+    breaker.check()
+    breaker.record(False)
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.check()
+    assert error.value.remaining == 30
+
+
+def test_breaker_allows_a_single_trial_after_the_cooldown(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    breaker.check()
+    breaker.record(False)
+    clock.now += 30
+    breaker.check()
+    # Only the trial request is allowed until it completes.
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record(False)
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock.now += 1
+    breaker.check()
+    breaker.record(True)
+    for _ in range(3):
+        breaker.check()
+
+
+def test_trial_without_outcome_keeps_the_breaker_half_open(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    breaker.check()
+    breaker.record(False)
+    clock.now += 30
+    breaker.check()
+    breaker.record(None)
+    # The next request is the trial, and a failure opens the breaker again.
+    breaker.check()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record(False)
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
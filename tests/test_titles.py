@@ -0,0 +1,101 @@
+"""
+Tests of the local trigram index of titles.
+"""
+
+import os
+from types import SimpleNamespace
+
+import titles
+from titles import TitleIndex, normalize, trigrams
+
+
+def movie(entry_id: str, title: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        entry_id=entry_id, title=title, release_date="2001-04-25", poster=None
+    )
+
+
+def loaded_index(path: str, max_titles: int = 100) -> TitleIndex:
+    index = TitleIndex(path, max_titles)
+    index.loaded = True
+    return index
+
+
+def test_normalize_folds_case_accents_and_punctuation():
+    assert normalize("Amélie:  Le Fabuleux Destin") == "amelie le fabuleux destin"
+    assert normalize("WALL·E") == "wall e"
+    assert normalize("  ") == ""
+
+
+def test_trigrams_pad_every_word():
+    assert trigrams("up") == {"  u", " up", "up "}
+    assert trigrams("it up", complete=False) == {"  i", " it", "it ", "  u", " up"}
+    assert trigrams("") == set()
+
+
+def test_suggest_tolerates_typos_and_ranks_prefixes_first(tmp_path):
+    index = loaded_index(str(tmp_path / "titles.idx"))
+    index.add(
+        [
+            movie("tm1", "The Matrix Reloaded"),
+            movie("tm2", "The Matrix"),
+            movie("tm3", "Matrix of Leadership"),
+            movie("tm4", "Amélie"),
+        ]
+    )
+    assert [t.entry_id for t in index.suggest("the matr", 2)] == ["tm2", "tm1"]
+    assert [t.entry_id for t in index.suggest("matri", 10)][0] == "tm3"
+    assert {t.entry_id for t in index.suggest("matrx", 10)} == {"tm1", "tm2", "tm3"}
+    assert [t.entry_id for t in index.suggest("AMELIE", 10)] == ["tm4"]
+    assert len(index.suggest("matrix", 1)) == 1
+    assert index.suggest("m", 10) == []
+    assert index.suggest("zzzzzz", 10) == []
+
+
+def test_least_recently_seen_titles_are_evicted(tmp_path):
+    index = loaded_index(str(tmp_path / "titles.idx"), max_titles=2)
+    index.add([movie("tm1", "Alien"), movie("tm2", "Aliens")])
+    # Seen again, the first title becomes the most recently seen.
+    index.add([movie("tm1", "Alien")])
+    index.add([movie("tm3", "Heat")])
+    assert len(index) == 2
+    assert [t.entry_id for t in index.suggest("alien", 10)] == ["tm1"]
+    assert all("tm2" not in posting for posting in index._postings.values())
+    assert "  h" in index._postings and " he" in index._postings
+
+
+def test_saved_index_is_loaded_back(tmp_path):
+    path = str(tmp_path / "titles.idx")
+    index = loaded_index(path)
+    index.add([movie("tm1", "Heat"), movie("tm2", "Ronin")])
+    assert index.save()
+    loaded = TitleIndex(path, 100)
+    loaded.load()
+    assert loaded.loaded and len(loaded) == 2
+    assert [t.title for t in loaded.suggest("ronin", 10)] == ["Ronin"]
+
+
+def test_malformed_index_is_rebuilt_from_the_cached_searches(tmp_path, monkeypatch):
+    path = str(tmp_path / "titles.idx")
+    index = loaded_index(path)
+    index.add([movie("tm1", "Heat")])
+    index._titles["tm1"].title = None
+    index.save()
+    cached = [["tm2", "Ronin", "1998-09-25", None]]
+    monkeypatch.setattr(titles, "_cached_titles", lambda: iter(cached))
+    for content in (None, b"not an index"):
+        if content is not None:
+            with open(path, "wb") as file:
+                file.write(content)
+        rebuilt = TitleIndex(path, 100)
+        rebuilt.load()
+        assert rebuilt.loaded
+        assert [t.entry_id for t in rebuilt.suggest("ronin", 10)] == ["tm2"]
+
+
+def test_unwritable_index_is_not_saved(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    index = loaded_index(os.path.join(str(blocker), "titles.idx"))
+    index.add([movie("tm1", "Heat")])
+    assert not index.save()
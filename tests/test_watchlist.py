@@ -0,0 +1,50 @@
+"""
+Tests of the persisted watchlist.
+"""
+
+import json
+from types import SimpleNamespace
+
+from watchlist import Watchlist, diff_offers
+
+
+def movie(entry_id: str) -> SimpleNamespace:
+    fields = {"entry_id": entry_id, "title": "Heat"}
+    return SimpleNamespace(**fields, offers=[], _asdict=lambda: dict(fields))
+
+
+def offer(price: str | None) -> dict:
+    return {"url": "https://example.com", "price": price}
+
+
+def test_offers_are_saved_and_compared(tmp_path):
+    path = str(tmp_path / "watchlist.json")
+    watchlist = Watchlist(path)
+    assert watchlist.add(movie("tm1"), {"US"})
+    assert watchlist.update("tm1", {"US": {"Netflix": offer(None), "Hulu": None}}) == []
+    loaded = Watchlist(path)
+    assert "tm1" in loaded
+    assert loaded.entries()[0]["offers"] == {"US": {"Netflix": offer(None)}}
+    changes = loaded.update("tm1", {"US": {"Netflix": offer("3.99 $"), "Hulu": None}})
+    assert changes == diff_offers(
+        {"US": {"Netflix": offer(None)}}, {"US": {"Netflix": offer("3.99 $")}}
+    )
+    assert changes[0]["change"] == "price"
+
+
+def test_uncompressed_and_malformed_files(tmp_path):
+    path = tmp_path / "watchlist.json"
+    path.write_text(json.dumps({"version": 1, "entries": {"tm1": {}}}))
+    assert "tm1" in Watchlist(str(path))
+    for content in ("[]", '{"entries": []}', "not json"):
+        path.write_text(content)
+        assert len(Watchlist(str(path))) == 0
+
+
+def test_change_that_cannot_be_saved_is_undone(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    watchlist = Watchlist(str(blocker / "watchlist.json"))
+    assert not watchlist.add(movie("tm1"))
+    assert "tm1" not in watchlist
+    assert watchlist.update("tm1", {}) == []